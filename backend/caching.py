@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from storage import as_datetime
+
+
+class SessionCache:
+    """Bounded LRU of session documents keyed by (store_id, session_id).
+
+    Entries live for `ttl` seconds but never past the moment the TTL index
+    would drop the session (`expires_at` + `purge_grace`). Unknown ids are
+    remembered for `negative_ttl` seconds so random ids cannot turn every
+    request into a Mongo lookup. The cache is per worker: call
+    `invalidate` wherever a session changes.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float, purge_grace: timedelta):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.purge_grace = purge_grace
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple[str, str]) -> tuple[bool, Optional[dict]]:
+        """Return (found, doc); doc is None for a cached miss."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        if entry[1] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, entry[1]
+
+    def put(self, key: tuple[str, str], doc: Optional[dict]) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl
+        if doc is None:
+            ttl = self.negative_ttl
+        else:
+            try:
+                purge_at = as_datetime(doc["expires_at"]) + self.purge_grace
+                ttl = min(ttl, (purge_at - datetime.now(timezone.utc)).total_seconds())
+            except (KeyError, ValueError):
+                pass
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl, doc)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,516 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import sqlite3
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Iterable, List, Optional, Sequence
+
+from pymongo.errors import ConnectionFailure
+
+from storage import Repository, StoreUnavailable, dump_doc, load_doc
+
+
+logger = logging.getLogger("photo_kiosk")
+
+_JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    UNIQUE (kind, key)
+);
+"""
+
+
+class WriteJournal:
+    """Durable local queue of documents not yet written to the main store.
+
+    Backed by a SQLite file (fsync on every commit) and mirrored in memory
+    so merged reads never touch disk. The file is owned by one process
+    through an advisory lock, so a second worker cannot open it; per-worker
+    files left behind by older releases are adopted on open.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock_file = None
+        # (kind, key) -> (version, doc), in first-write order
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _try_lock(path: Path):
+        lock_file = open(f"{path}.lock", "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    @staticmethod
+    def _connect(path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.executescript(_JOURNAL_SCHEMA)
+        return conn
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        for suffix in ("", "-wal", "-shm", ".lock"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> int:
+        """Lock and load this journal, then adopt orphans; returns pending entries."""
+
+        def open_():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_file = self._try_lock(self.path)
+            if self._lock_file is None:
+                raise RuntimeError(
+                    f"write journal {self.path} is in use by another process; "
+                    "run a single worker per WRITE_JOURNAL_DIR"
+                )
+            self._conn = self._connect(self.path)
+            for kind, key, version, raw in self._conn.execute(
+                "SELECT kind, key, version, doc FROM entries ORDER BY seq"
+            ):
+                self._entries[(kind, key)] = (version, load_doc(raw))
+
+            for orphan in sorted(self.path.parent.glob("journal-*.db")):
+                if orphan == self.path:
+                    continue
+                lock_file = self._try_lock(orphan)
+                if lock_file is None:
+                    continue  # a live worker owns it
+                try:
+                    other = self._connect(orphan)
+                    rows = other.execute("SELECT kind, key, doc FROM entries ORDER BY seq").fetchall()
+                    other.close()
+                    for kind, key, raw in rows:
+                        self._put(kind, key, load_doc(raw))
+                    self._remove(orphan)
+                    logger.info("adopted %d journal entries from %s", len(rows), orphan.name)
+                finally:
+                    lock_file.close()
+            return len(self._entries)
+
+        return await self._run(open_)
+
+    def _put(self, kind: str, key: str, doc: dict) -> int:
+        current = self._entries.get((kind, key))
+        version = current[0] + 1 if current else 1
+        self._conn.execute(
+            "INSERT INTO entries (kind, key, version, doc) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (kind, key) DO UPDATE SET version = excluded.version, doc = excluded.doc",
+            (kind, key, version, dump_doc(doc)),
+        )
+        self._entries[(kind, key)] = (version, dict(doc))
+        return version
+
+    async def put(self, kind: str, key: str, doc: dict) -> int:
+        """Durably record the latest version of a document; returns its version."""
+        return await self._run(self._put, kind, key, doc)
+
+    async def discard(self, kind: str, key: str, version: int) -> bool:
+        """Forget an entry once flushed, unless it was rewritten meanwhile."""
+
+        def discard():
+            current = self._entries.get((kind, key))
+            if not current or current[0] != version:
+                return False
+            self._conn.execute("DELETE FROM entries WHERE kind = ? AND key = ? AND version = ?", (kind, key, version))
+            del self._entries[(kind, key)]
+            return True
+
+        return await self._run(discard)
+
+    def get(self, kind: str, key: str) -> Optional[dict]:
+        entry = self._entries.get((kind, key))
+        return dict(entry[1]) if entry else None
+
+    def docs(self, kind: str) -> List[dict]:
+        return [dict(doc) for (k, _), (_, doc) in self._entries.items() if k == kind]
+
+    def pending(self) -> List[tuple]:
+        return [(kind, key, version, doc) for (kind, key), (version, doc) in self._entries.items()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def close(self) -> None:
+        def close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            if not self._entries:
+                self._remove(self.path)
+
+        await self._run(close)
+        self._executor.shutdown(wait=True)
+
+
+def _key(store_id: str, doc_id: str) -> str:
+    # photo ids and order numbers are only unique within a store
+    return f"{store_id}:{doc_id}"
+
+
+def _order_matches(
+    doc: dict,
+    status: Optional[str],
+    session_id: Optional[str],
+    created_from: Optional[datetime],
+    created_before: Optional[datetime],
+    after: Optional[tuple[datetime, str]],
+    ascending: bool,
+) -> bool:
+    created = doc["created_at"]
+    if status and doc.get("status") != status:
+        return False
+    if session_id and doc.get("session_id") != session_id:
+        return False
+    if created_from and created < created_from:
+        return False
+    if created_before and created >= created_before:
+        return False
+    if after:
+        key = (created, doc["order_number"])
+        if (key <= after) if ascending else (key >= after):
+            return False
+    return True
+
+
+class JournaledRepository(Repository):
+    """Commits kiosk writes to a local journal before the wrapped store.
+
+    Sessions, photos, orders and rollup increments return as soon as the
+    journal entry is on disk. A background task replays entries with the
+    idempotent save_* methods (keyed by store and id) and bump_rollups;
+    increments are replayed at least once. Reads merge entries not flushed
+    yet, sessions created by this process are answered from memory, and
+    every other read of the wrapped store gives up after `read_timeout`
+    with StoreUnavailable, so kiosk latency does not follow database
+    latency. Rollups show up in the stats once replayed.
+
+    The journal and the in-memory sessions belong to one process: run a
+    single worker per journal directory (a second one fails to open it).
+    """
+
+    def __init__(
+        self,
+        inner: Repository,
+        directory: str,
+        retry_seconds: float = 5.0,
+        legacy_store_id: str = "main",
+        read_timeout: float = 2.0,
+        recent_sessions: int = 1024,
+    ):
+        self.inner = inner
+        self.legacy_store_id = legacy_store_id
+        self.name = f"{inner.name}+journal"
+        self.journal = WriteJournal(Path(directory) / "journal.db")
+        self.retry_seconds = retry_seconds
+        self.read_timeout = read_timeout
+        self._savers = {
+            "session": inner.save_session,
+            "photo": inner.save_photo,
+            "order": inner.save_order,
+            "rollup": lambda d: inner.bump_rollups(d["store_id"], d["day"], d["hour"], d["inc"], d.get("maximums")),
+        }
+        # (store_id, session_id) -> {"session": doc, "photos": {photo_id: doc}} for sessions created here
+        self._recent: OrderedDict = OrderedDict()
+        self.recent_sessions = recent_sessions
+        # status changes of journaled orders read the entry, then await the rewrite; the
+        # stores do both atomically, so callers must not interleave here either
+        self._orders_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.replayed = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_error: Optional[str] = None
+
+    async def open(self) -> None:
+        """Open the journal and start replaying it; does not need the wrapped store."""
+        if self._task is not None:
+            return
+        pending = await self.journal.open()
+        for kind, key, version, doc in self.journal.pending():
+            if "store_id" not in doc:
+                # written before stores existed
+                doc = {**doc, "store_id": self.legacy_store_id}
+                await self.journal.put(kind, _key(doc["store_id"], key), doc)
+                await self.journal.discard(kind, key, version)
+        if pending:
+            logger.info("write journal has %d entries to replay", pending)
+        self._wake = asyncio.Event()
+        self._wake.set()
+        self._task = asyncio.create_task(self._replay_forever())
+
+    async def ensure_schema(self) -> None:
+        # writes must be accepted even when the wrapped store is down at startup
+        await self.open()
+        await self.inner.ensure_schema()
+
+    async def _bounded(self, call: Awaitable):
+        try:
+            return await asyncio.wait_for(call, self.read_timeout)
+        except (asyncio.TimeoutError, ConnectionError, ConnectionFailure) as exc:
+            self.timeouts += 1
+            raise StoreUnavailable(f"{self.inner.name} did not answer: {exc!r}") from exc
+
+    async def _replay_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.retry_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not len(self.journal):
+                continue
+            try:
+                await self.flush()
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = repr(exc)
+                logger.warning("journal replay failed, %d entries pending: %s", len(self.journal), exc)
+                await asyncio.sleep(self.retry_seconds)
+
+    async def flush(self) -> int:
+        """Write every pending entry to the wrapped store; returns entries flushed."""
+        flushed = 0
+        for kind, key, version, doc in self.journal.pending():
+            await self._savers[kind](doc)
+            if await self.journal.discard(kind, key, version):
+                flushed += 1
+        self.replayed += flushed
+        return flushed
+
+    async def _append(self, kind: str, key: str, doc: dict) -> None:
+        await self.journal.put(kind, key, doc)
+        if self._wake is not None:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.journal),
+            "replayed": self.replayed,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "recent_sessions": len(self._recent),
+            "last_error": self.last_error,
+        }
+
+    async def purge_expired(self) -> int:
+        return await self.inner.purge_expired()
+
+    async def warm_up(self, connections: int) -> None:
+        await self.inner.warm_up(connections)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if len(self.journal):
+            try:
+                await asyncio.wait_for(self.flush(), timeout=self.retry_seconds)
+            except Exception:
+                logger.warning("leaving %d journal entries for the next start", len(self.journal))
+        await self.journal.close()
+        await self.inner.close()
+
+    async def get_settings(self, store_id: str) -> Optional[dict]:
+        return await self._bounded(self.inner.get_settings(store_id))
+
+    async def insert_settings(self, doc: dict) -> None:
+        await self.inner.insert_settings(doc)
+
+    async def update_settings(self, store_id: str, fields: dict) -> None:
+        await self.inner.update_settings(store_id, fields)
+
+    async def insert_session(self, doc: dict) -> None:
+        await self._append("session", _key(doc["store_id"], doc["session_id"]), doc)
+        self._recent[(doc["store_id"], doc["session_id"])] = {"session": dict(doc), "photos": {}}
+        while len(self._recent) > self.recent_sessions:
+            self._recent.popitem(last=False)
+
+    async def save_session(self, doc: dict) -> None:
+        await self.inner.save_session(doc)
+
+    async def get_session(self, store_id: str, session_id: str) -> Optional[dict]:
+        recent = self._recent.get((store_id, session_id))
+        if recent is not None:
+            return dict(recent["session"])
+        return self.journal.get("session", _key(store_id, session_id)) or await self._bounded(
+            self.inner.get_session(store_id, session_id)
+        )
+
+    async def insert_photo(self, doc: dict) -> None:
+        await self._append("photo", _key(doc["store_id"], doc["photo_id"]), doc)
+        recent = self._recent.get((doc["store_id"], doc["session_id"]))
+        if recent is not None:
+            recent["photos"][doc["photo_id"]] = dict(doc)
+
+    async def save_photo(self, doc: dict) -> None:
+        await self.inner.save_photo(doc)
+
+    async def list_session_photos(
+        self, store_id: str, session_id: str, photo_ids: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        wanted = set(photo_ids or ())
+        recent = self._recent.get((store_id, session_id))
+        if recent is not None:
+            # every photo of a session created here went through this process
+            photos = [dict(p) for pid, p in recent["photos"].items() if not wanted or pid in wanted]
+            return sorted(photos, key=lambda p: p["created_at"])
+        journaled = {
+            d["photo_id"]: d
+            for d in self.journal.docs("photo")
+            if d["store_id"] == store_id
+            and d["session_id"] == session_id
+            and (not wanted or d["photo_id"] in wanted)
+        }
+        stored = await self._bounded(self.inner.list_session_photos(store_id, session_id, photo_ids))
+        if not journaled:
+            return stored
+        merged = [p for p in stored if p["photo_id"] not in journaled] + list(journaled.values())
+        return sorted(merged, key=lambda p: p["created_at"])
+
+    async def get_photos(self, store_id: str, photo_ids: Sequence[str]) -> List[dict]:
+        journaled, missing = [], []
+        for pid in photo_ids:
+            doc = self.journal.get("photo", _key(store_id, pid))
+            if doc:
+                journaled.append(doc)
+            else:
+                missing.append(pid)
+        return journaled + (await self._bounded(self.inner.get_photos(store_id, missing)) if missing else [])
+
+    async def insert_order(self, doc: dict) -> None:
+        await self._append("order", _key(doc["store_id"], doc["order_number"]), doc)
+
+    async def save_order(self, doc: dict) -> None:
+        await self.inner.save_order(doc)
+
+    async def get_order(self, store_id: str, order_number: str) -> Optional[dict]:
+        return self.journal.get("order", _key(store_id, order_number)) or await self._bounded(
+            self.inner.get_order(store_id, order_number)
+        )
+
+    async def get_orders(self, store_id: str, order_numbers: Sequence[str]) -> List[dict]:
+        journaled, missing = [], []
+        for number in order_numbers:
+            doc = self.journal.get("order", _key(store_id, number))
+            if doc:
+                journaled.append(doc)
+            else:
+                missing.append(number)
+        return journaled + (await self._bounded(self.inner.get_orders(store_id, missing)) if missing else [])
+
+    async def transition_orders(
+        self, store_id: str, order_numbers: Sequence[str], from_statuses: Sequence[str], status: str, fields: dict
+    ) -> tuple[List[dict], set]:
+        docs, changed, stored = [], set(), []
+        async with self._orders_lock:
+            for number in order_numbers:
+                doc = self.journal.get("order", _key(store_id, number))
+                if doc is None:
+                    stored.append(number)
+                    continue
+                if doc["status"] in from_statuses:
+                    doc = {**doc, **fields, "status": status}
+                    await self._append("order", _key(store_id, number), doc)
+                    changed.add(number)
+                docs.append(doc)
+        if stored:
+            stored_docs, stored_changed = await self.inner.transition_orders(
+                store_id, stored, from_statuses, status, fields
+            )
+            docs += stored_docs
+            changed |= stored_changed
+        return docs, changed
+
+    async def mark_order_printed(self, store_id: str, order_number: str, printed_at: datetime) -> Optional[dict]:
+        key = _key(store_id, order_number)
+        async with self._orders_lock:
+            before = self.journal.get("order", key)
+            if before is not None and before["status"] != "cancelled":
+                # still unflushed: rewrite the entry, the replay carries the new state
+                await self._append("order", key, {**before, "status": "printed", "printed_at": printed_at})
+        if before is None:
+            return await self.inner.mark_order_printed(store_id, order_number, printed_at)
+        return before
+
+    async def list_orders(
+        self,
+        store_id: str,
+        *,
+        status: Optional[str] = None,
+        session_id: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        after: Optional[tuple[datetime, str]] = None,
+        ascending: bool = False,
+        limit: int = 50,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        journaled = [d for d in self.journal.docs("order") if d["store_id"] == store_id]
+        requested = list(fields) if fields else None
+        # stored copies of journaled orders may be stale: fetch enough extra rows to drop them,
+        # plus the keys needed to merge
+        stored = await self._bounded(
+            self.inner.list_orders(
+                store_id,
+                status=status,
+                session_id=session_id,
+                created_from=created_from,
+                created_before=created_before,
+                after=after,
+                ascending=ascending,
+                limit=limit + len(journaled),
+                fields=requested + ["order_number", "created_at"] if requested and journaled else requested,
+            )
+        )
+        if not journaled:
+            return stored[:limit]
+
+        numbers = {d["order_number"] for d in journaled}
+        merged = [o for o in stored if o["order_number"] not in numbers]
+        merged += [
+            d
+            for d in journaled
+            if _order_matches(d, status, session_id, created_from, created_before, after, ascending)
+        ]
+        merged.sort(key=lambda o: (o["created_at"], o["order_number"]), reverse=not ascending)
+        if requested:
+            merged = [{k: v for k, v in o.items() if k in requested} for o in merged]
+        return merged[:limit]
+
+    async def reserve_sequence(self, name: str, count: int, purge_at: datetime) -> int:
+        # a reservation lost to the timeout only skips numbers
+        return await self._bounded(self.inner.reserve_sequence(name, count, purge_at))
+
+    async def bump_rollups(
+        self, store_id: str, day: str, hour: str, inc: dict, maximums: Optional[dict] = None
+    ) -> None:
+        doc = {"store_id": store_id, "day": day, "hour": hour, "inc": inc, "maximums": maximums}
+        await self._append("rollup", _key(store_id, uuid.uuid4().hex), doc)
+
+    async def get_rollups(self, store_id: str, granularity: str, day_from: str, day_to: str) -> List[dict]:
+        return await self.inner.get_rollups(store_id, granularity, day_from, day_to)
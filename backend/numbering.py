@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone, tzinfo
+
+from storage import Repository
+
+logger = logging.getLogger("photo_kiosk")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OrderNumberAllocator:
+    """Short sequential order numbers, e.g. APF-261019-0042.
+
+    Sequences restart every store day (in the timezone the caller passes
+    for that store) and come from a per-store, per-day
+    counter document. Each worker reserves `block_size` numbers per `$inc`,
+    so numbers are unique within a store across workers and increasing
+    within a worker; numbers left in a block when a worker stops are
+    simply skipped.
+
+    With `reserve_ahead` the next block is reserved in the background as
+    soon as one is taken, so a worker keeps numbering orders through a
+    store outage of up to one block (within the same day).
+    """
+
+    def __init__(self, repo: Repository, prefix: str, block_size: int, reserve_ahead: bool = False):
+        self.repo = repo
+        self.prefix = prefix
+        self.block_size = max(1, block_size)
+        self.reserve_ahead = reserve_ahead
+        self._lock = asyncio.Lock()
+        # store_id -> [day, next, last]
+        self._blocks: dict = {}
+        self._spares: dict = {}
+        self._refills: dict = {}
+        self.allocated = 0
+        self.reservations = 0
+
+    async def _reserve(self, store_id: str, day: str) -> int:
+        """Reserve the store's next block for `day`, returning its last number."""
+        # the counter is only needed while its day can still receive orders
+        last = await self.repo.reserve_sequence(
+            f"order_number:{store_id}:{self.prefix}:{day}", self.block_size, purge_at=_now() + timedelta(days=2)
+        )
+        self.reservations += 1
+        return last
+
+    async def next(self, store_id: str, tz: tzinfo) -> str:
+        day = _now().astimezone(tz).strftime("%y%m%d")
+        async with self._lock:
+            block = self._blocks.get(store_id)
+            if block is None or day != block[0] or block[1] > block[2]:
+                spare = self._spares.pop(store_id, None)
+                if spare is None or spare[0] != day:
+                    last = await self._reserve(store_id, day)
+                    spare = [day, last - self.block_size + 1, last]
+                block = self._blocks[store_id] = spare
+            seq = block[1]
+            block[1] += 1
+            self.allocated += 1
+            if self.reserve_ahead and store_id not in self._spares and store_id not in self._refills:
+                self._refills[store_id] = asyncio.create_task(self._reserve_spare(store_id, day))
+        return f"{self.prefix}-{day}-{seq:04d}"
+
+    async def prime(self, zones: dict) -> None:
+        """Reserve each store's first block of the day before any order needs it.
+
+        `zones` maps store_id -> the tzinfo its days are counted in.
+        """
+        if self.reserve_ahead:
+            now = _now()
+            await asyncio.gather(
+                *(self._reserve_spare(store_id, now.astimezone(tz).strftime("%y%m%d")) for store_id, tz in zones.items())
+            )
+
+    async def _reserve_spare(self, store_id: str, day: str) -> None:
+        try:
+            last = await self._reserve(store_id, day)
+            self._spares[store_id] = [day, last - self.block_size + 1, last]
+        except Exception as exc:
+            # retried on the next order
+            logger.warning("could not reserve order numbers ahead for %s: %s", store_id, exc)
+        finally:
+            self._refills.pop(store_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "allocated": self.allocated,
+            "reservations": self.reservations,
+            "block_size": self.block_size,
+            "spare_blocks": len(self._spares),
+            "remaining_in_block": {store: max(0, last - nxt + 1) for store, (_, nxt, last) in self._blocks.items()},
+        }
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger("photo_kiosk")
+
+Key = Tuple[str, str]
+
+READ_CHUNK = 1 << 20
+
+
+def _read_through(path: Path) -> int:
+    """Read a file once so the OS keeps it in the page cache; returns its size."""
+    size = 0
+    with open(path, "rb") as fh:
+        while chunk := fh.read(READ_CHUNK):
+            size += len(chunk)
+    return size
+
+
+class PrintPrefetcher:
+    """Warms what the print pages need while the customer walks to the till.
+
+    `enqueue` hands an order to a small pool of worker tasks. A job builds
+    the order payload, keeps it in an LRU keyed by (store_id, order_number)
+    for `ttl` seconds and reads every photo file once, so the print page's
+    image requests are served from the page cache. Status per order goes
+    queued -> running -> ready | failed. Like the session cache this is per
+    worker; orders created on another worker simply report no status.
+    """
+
+    def __init__(self, workers: int, max_entries: int, ttl: float):
+        self.workers = max(0, workers)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: list = []
+        # key -> {"status", "payload", "expires", "error", ...}
+        self._entries: OrderedDict = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+        self.bytes_warmed = 0
+        self.hits = 0
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, key: Key, build: Callable[[], Awaitable[Tuple[Any, Iterable[Path]]]]) -> Optional[str]:
+        """Schedule a job; `build` returns the payload and the files to warm."""
+        if not self._tasks or self.max_entries <= 0:
+            return None
+        self._store(key, {"status": "queued", "payload": None, "queued_at": time.perf_counter()})
+        self._queue.put_nowait((key, build))
+        return "queued"
+
+    async def _work(self) -> None:
+        while True:
+            key, build = await self._queue.get()
+            try:
+                await self._run(key, build)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, key: Key, build) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return  # evicted while queued
+        entry["status"] = "running"
+        try:
+            payload, paths = await build()
+            warmed = 0
+            for path in paths:
+                warmed += await asyncio.to_thread(_read_through, path)
+        except Exception as exc:
+            entry.update(status="failed", error=repr(exc))
+            self.failed += 1
+            logger.warning("print prefetch failed for %s: %s", key[1], exc)
+            return
+        entry.update(
+            status="ready",
+            payload=payload,
+            bytes=warmed,
+            duration_ms=round((time.perf_counter() - entry["queued_at"]) * 1000, 1),
+        )
+        self.completed += 1
+        self.bytes_warmed += warmed
+
+    def _store(self, key: Key, entry: dict) -> None:
+        entry["expires"] = time.monotonic() + self.ttl
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _entry(self, key: Key) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires"] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def status(self, key: Key) -> Optional[str]:
+        entry = self._entry(key)
+        return entry["status"] if entry else None
+
+    def payload(self, key: Key) -> Optional[Any]:
+        entry = self._entry(key)
+        if entry is None or entry["payload"] is None:
+            return None
+        self.hits += 1
+        return entry["payload"]
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "entries": len(self._entries),
+            "completed": self.completed,
+            "failed": self.failed,
+            "payload_hits": self.hits,
+            "bytes_warmed": self.bytes_warmed,
+        }
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import abc
+import contextvars
+import inspect
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from storage import Repository
+
+# per-request storage timings, only set while a request is being profiled
+_storage_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("storage_timings", default=None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Opt-in statistical profiler for the event-loop thread.
+
+    While enabled, a daemon thread records the loop thread's stack every
+    `interval_ms` into a short ring buffer. When a request finishes and is
+    either randomly sampled or slower than `slow_ms`, the samples taken
+    during it whose stack runs through its endpoint are folded into a
+    flamegraph-ready profile, together with its storage call timings.
+    Disabled, requests pay one attribute check.
+    """
+
+    def __init__(self, sample_rate: float, slow_ms: float, interval_ms: float = 5.0, keep: int = 50):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval_ms = interval_ms
+        self.enabled = False
+        self.profiles: deque = deque(maxlen=keep)
+        # (monotonic time, innermost-first code objects); ~60 s of history
+        self._samples: deque = deque(maxlen=int(60_000 / max(interval_ms, 1.0)))
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self) -> None:
+        """Start sampling; must be called from the event-loop thread."""
+        if self.enabled:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_forever, name="profiler", daemon=True)
+        self._thread.start()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self._samples.clear()
+
+    def _sample_forever(self) -> None:
+        interval = self.interval_ms / 1000
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self._samples.append((time.monotonic(), tuple(codes)))
+
+    def should_keep(self, duration_ms: float) -> Optional[str]:
+        if self.slow_ms and duration_ms >= self.slow_ms:
+            return "slow"
+        if random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def record(
+        self,
+        *,
+        method: str,
+        route: str,
+        status: int,
+        started: float,
+        finished: float,
+        reason: str,
+        endpoint_code,
+        storage: dict,
+    ) -> dict:
+        stacks: Counter = Counter()
+        for ts, codes in list(self._samples):
+            if ts < started or ts > finished:
+                continue
+            # the loop also runs other requests; keep the samples taken inside this one's endpoint
+            if endpoint_code is not None and endpoint_code not in codes:
+                continue
+            stacks[";".join(_frame_label(c) for c in reversed(codes))] += 1
+        profile = {
+            "profile_id": uuid.uuid4().hex[:12],
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "method": method,
+            "route": route,
+            "status": status,
+            "duration_ms": round((finished - started) * 1000, 2),
+            "reason": reason,
+            "samples": sum(stacks.values()),
+            "interval_ms": self.interval_ms,
+            "storage": {
+                op: {"calls": t["calls"], "total_ms": round(t["total_ms"], 2)}
+                for op, t in sorted(storage.items(), key=lambda kv: -kv[1]["total_ms"])
+            },
+            "stacks": dict(stacks.most_common()),
+        }
+        self.profiles.append(profile)
+        return profile
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "interval_ms": self.interval_ms,
+            "profiles": len(self.profiles),
+        }
+
+
+class ProfilingMiddleware:
+    """Plain ASGI middleware, so a disabled profiler adds no per-request wrapping."""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        timings: dict = {}
+        token = _storage_timings.set(timings)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.monotonic()
+            _storage_timings.reset(token)
+            reason = self.profiler.should_keep((finished - started) * 1000)
+            if reason:
+                route = scope.get("route")
+                endpoint = scope.get("endpoint")
+                self.profiler.record(
+                    method=scope.get("method", ""),
+                    route=getattr(route, "path", scope.get("path", "")),
+                    status=status["code"],
+                    started=started,
+                    finished=finished,
+                    reason=reason,
+                    endpoint_code=getattr(endpoint, "__code__", None),
+                    storage=timings,
+                )
+
+
+def _timed(name: str):
+    async def method(self, *args, **kwargs):
+        call = getattr(self.inner, name)
+        timings = _storage_timings.get()
+        if timings is None:
+            return await call(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            entry = timings.setdefault(name, {"calls": 0, "total_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] += (time.perf_counter() - started) * 1000
+
+    method.__name__ = method.__qualname__ = name
+    return method
+
+
+class TimedRepository(Repository):
+    """Repository recording how long each call takes for the profiled request.
+
+    The wrappers are built once, when this module is imported; while
+    nothing is profiled a call costs one context-variable lookup on top of
+    the wrapped store's.
+    """
+
+    def __init__(self, inner: Repository):
+        self.inner = inner
+        self.name = inner.name
+
+
+for _name, _fn in list(vars(Repository).items()):
+    if inspect.iscoroutinefunction(_fn):
+        setattr(TimedRepository, _name, _timed(_name))
+abc.update_abstractmethods(TimedRepository)
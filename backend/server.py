@@ -1,30 +1,133 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
 import logging
+import math
+import mimetypes
 import os
+import time
 import uuid
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import Annotated, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, ConfigDict, Field
+from fastapi import APIRouter, Depends, FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer
 from starlette.middleware.cors import CORSMiddleware
 
+from caching import SessionCache
+from journal import JournaledRepository
+from numbering import OrderNumberAllocator
+from prefetch import PrintPrefetcher
+from profiling import ProfilingMiddleware, SamplingProfiler, TimedRepository
+from storage import MotorRepository, Repository, SQLiteRepository, StoreUnavailable, as_datetime
+from throttling import LoopLagMonitor, RatePolicy, TokenBucketLimiter
+from warmup import FirstRequestTimer, WarmUp
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / ".env")
 
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
-
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# local calendar of a store: day/hour boundaries of rollups, date filters and order numbers;
+# stores can override it with "timezone" in their settings (STATS_TIMEZONE is the old name)
+DEFAULT_TIMEZONE = os.environ.get("STORE_TIMEZONE") or os.environ.get("STATS_TIMEZONE", "UTC")
+DEFAULT_TZ = ZoneInfo(DEFAULT_TIMEZONE)
+
+SESSION_DURATION = timedelta(hours=2)
+# expired sessions stay around long enough to answer 410 before the TTL monitor drops them
+SESSION_TTL_GRACE = timedelta(hours=float(os.environ.get("SESSION_TTL_GRACE_HOURS", "24")))
+# photo metadata outlives its session so orders can still be reprinted
+PHOTO_RETENTION = timedelta(days=float(os.environ.get("PHOTO_RETENTION_DAYS", "30")))
+
+# stores served by this deployment; requests name theirs in X-Store-Id, those without one
+# go to DEFAULT_STORE_ID, which also owns data written before stores existed
+DEFAULT_STORE_ID = os.environ.get("DEFAULT_STORE_ID", "main")
+STORE_IDS = frozenset({DEFAULT_STORE_ID, *(s.strip() for s in os.environ.get("STORE_IDS", "").split(",") if s.strip())})
+
+# connections opened during warm-up and kept open by the driver afterwards
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "10"))
+
+# "mongo" (default) or "sqlite" for single-box kiosks without a database server
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo")
+if STORAGE_BACKEND == "sqlite":
+    repo: Repository = SQLiteRepository(
+        os.environ.get("SQLITE_PATH", str(ROOT_DIR / "kiosk.db")),
+        session_ttl_grace=SESSION_TTL_GRACE,
+        legacy_store_id=DEFAULT_STORE_ID,
+    )
+elif STORAGE_BACKEND == "mongo":
+    repo = MotorRepository(
+        os.environ["MONGO_URL"],
+        os.environ["DB_NAME"],
+        session_ttl_grace=SESSION_TTL_GRACE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxPoolSize=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+    )
+else:
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (expected 'mongo' or 'sqlite')")
+
+# sessions, photos, orders and rollups are committed to a local journal first and replayed in
+# the background; other reads give up after WRITE_JOURNAL_READ_TIMEOUT_SECONDS with a 503.
+# The journal is per process: run a single worker (uvicorn without --workers) per
+# WRITE_JOURNAL_DIR; a second worker on the same directory fails at startup.
+journaled_repo: Optional[JournaledRepository] = None
+if os.environ.get("WRITE_JOURNAL_DIR"):
+    repo = journaled_repo = JournaledRepository(
+        repo,
+        os.environ["WRITE_JOURNAL_DIR"],
+        retry_seconds=float(os.environ.get("WRITE_JOURNAL_RETRY_SECONDS", "5")),
+        legacy_store_id=DEFAULT_STORE_ID,
+        read_timeout=float(os.environ.get("WRITE_JOURNAL_READ_TIMEOUT_SECONDS", "2")),
+        recent_sessions=int(os.environ.get("WRITE_JOURNAL_RECENT_SESSIONS", "1024")),
+    )
+
+# storage calls are timed for the request being profiled; a no-op otherwise
+repo = TimedRepository(repo)
+
+# unauthenticated endpoints that reach the store on every call
+SESSION_RATE = RatePolicy(
+    "create_session",
+    per_minute=float(os.environ.get("SESSION_RATE_PER_MINUTE", "12")),
+    burst=int(os.environ.get("SESSION_RATE_BURST", "20")),
+)
+PIN_RATE = RatePolicy(
+    "verify_pin",
+    per_minute=float(os.environ.get("PIN_RATE_PER_MINUTE", "5")),
+    burst=int(os.environ.get("PIN_RATE_BURST", "5")),
+)
+# Required for the per-client limits above: the number of reverse proxies (ingress, load
+# balancer) in front of the API that append to X-Forwarded-For, or 0 when clients connect
+# directly. Guessing wrong keys every kiosk of every store by the proxy's address, so while it
+# is unset the limits stay off (load shedding still applies).
+TRUSTED_PROXY_HOPS = int(os.environ["TRUSTED_PROXY_HOPS"]) if "TRUSTED_PROXY_HOPS" in os.environ else None
+# also enforce per-minute limits across workers through a counter in the store
+RATE_LIMIT_SHARED = os.environ.get("RATE_LIMIT_SHARED", "") == "1"
+
+rate_limiter = TokenBucketLimiter()
+loop_lag = LoopLagMonitor(threshold_ms=float(os.environ.get("LOAD_SHED_LAG_MS", "250")))
+
+# opt-in; can also be switched on at runtime through PUT /api/admin/profiling
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+warmup = WarmUp(retry_seconds=float(os.environ.get("WARM_UP_RETRY_SECONDS", "5")))
+WARM_UP_STARTUP_WAIT = float(os.environ.get("WARM_UP_STARTUP_WAIT_SECONDS", "10"))
+
+profiler = SamplingProfiler(
+    # fraction of requests profiled regardless of latency
+    sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", "0.01")),
+    # requests at least this slow are always kept (0 disables)
+    slow_ms=float(os.environ.get("PROFILING_SLOW_MS", "1000")),
+    interval_ms=float(os.environ.get("PROFILING_INTERVAL_MS", "5")),
+    keep=int(os.environ.get("PROFILING_KEEP", "50")),
+)
+
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
@@ -32,38 +135,73 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger("photo_kiosk")
 
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def _now() -> datetime:
+    # BSON datetimes keep milliseconds; truncate so responses match what is stored
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+# stored as BSON datetimes, served as the same ISO strings as before
+Timestamp = Annotated[datetime, PlainSerializer(lambda v: as_datetime(v).isoformat(), return_type=str)]
 
 
 def _safe_filename(name: str) -> str:
     return Path(name).name
 
 
-async def _ensure_global_settings() -> dict:
-    existing = await db.settings.find_one({"key": "global"}, {"_id": 0})
+# settings are read on every order and PIN check; other workers see changes after the TTL
+SETTINGS_CACHE_TTL = float(os.environ.get("SETTINGS_CACHE_TTL_SECONDS", "30"))
+# store_id -> (expires at, settings)
+_settings_cache: dict = {}
+
+
+def _cache_settings(store_id: str, settings: dict) -> dict:
+    _settings_cache[store_id] = (time.monotonic() + SETTINGS_CACHE_TTL, settings)
+    return settings
+
+
+async def _ensure_store_settings(store_id: str) -> dict:
+    cached = _settings_cache.get(store_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    try:
+        existing = await repo.get_settings(store_id)
+    except StoreUnavailable:
+        if cached:
+            # keep taking orders at the last known prices while the store is unreachable
+            return _cache_settings(store_id, cached[1])
+        raise
     if existing:
         # ensure admin pin exists for older docs
         if "admin_pin" not in existing:
-            await db.settings.update_one(
-                {"key": "global"},
-                {"$set": {"admin_pin": "1234", "updated_at": _now_iso()}},
-                upsert=True,
-            )
+            await repo.update_settings(store_id, {"admin_pin": "1234", "updated_at": _now()})
             existing["admin_pin"] = "1234"
-        return existing
+        return _cache_settings(store_id, existing)
 
     default = {
-        "key": "global",
+        "store_id": store_id,
         "store_name": "Amor por Fotos",
         "currency": "BRL",
         "price_per_photo": 2.50,
         "receipt_footer": "Leve este comprovante ao caixa para pagamento.",
+        "timezone": DEFAULT_TIMEZONE,
         "admin_pin": "1234",
-        "updated_at": _now_iso(),
+        "updated_at": _now(),
     }
-    await db.settings.insert_one(default)
-    return {k: v for k, v in default.items() if k != "_id"}
+    # another worker may create the doc at the same time; whichever landed first wins
+    await repo.insert_settings(default)
+    return _cache_settings(store_id, await repo.get_settings(store_id) or default)
+
+
+def _zone(settings: dict) -> ZoneInfo:
+    try:
+        return ZoneInfo(settings.get("timezone") or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return DEFAULT_TZ
+
+
+async def _store_tz(store_id: str) -> ZoneInfo:
+    return _zone(await _ensure_store_settings(store_id))
 
 
 class SettingsOut(BaseModel):
@@ -73,7 +211,8 @@ class SettingsOut(BaseModel):
     currency: str
     price_per_photo: float
     receipt_footer: str
-    updated_at: str
+    timezone: str = DEFAULT_TIMEZONE
+    updated_at: Timestamp
 
 
 class SettingsUpdateIn(BaseModel):
@@ -81,6 +220,7 @@ class SettingsUpdateIn(BaseModel):
     currency: Optional[str] = None
     price_per_photo: Optional[float] = None
     receipt_footer: Optional[str] = None
+    timezone: Optional[str] = None
     admin_pin: Optional[str] = None
 
 
@@ -93,8 +233,8 @@ class SessionCreateOut(BaseModel):
 
     session_id: str
     upload_path: str
-    expires_at: str
-    created_at: str
+    expires_at: Timestamp
+    created_at: Timestamp
 
 
 class PhotoOut(BaseModel):
@@ -107,7 +247,7 @@ class PhotoOut(BaseModel):
     mime_type: str
     size_bytes: int
     url_path: str
-    created_at: str
+    created_at: Timestamp
 
 
 class SessionOut(BaseModel):
@@ -115,10 +255,10 @@ class SessionOut(BaseModel):
 
     session_id: str
     status: str
-    created_at: str
-    expires_at: str
+    created_at: Timestamp
+    expires_at: Timestamp
     photos_count: int
-    last_uploaded_at: Optional[str] = None
+    last_uploaded_at: Optional[Timestamp] = None
 
 
 class SessionWithPhotosOut(SessionOut):
@@ -141,9 +281,161 @@ class OrderOut(BaseModel):
     store_name: str
     receipt_footer: str
     status: str
-    created_at: str
-    printed_at: Optional[str] = None
+    created_at: Timestamp
+    printed_at: Optional[Timestamp] = None
+    cancelled_at: Optional[Timestamp] = None
     photos: List[PhotoOut] = Field(default_factory=list)
+    # queued/running/ready/failed while this worker holds the order's print prefetch
+    prefetch_status: Optional[str] = None
+
+
+class OrderNumbersIn(BaseModel):
+    order_numbers: List[str] = Field(min_length=1, max_length=500)
+
+
+class BulkOrdersOut(BaseModel):
+    orders: List[OrderOut] = Field(default_factory=list)
+    changed: List[str] = Field(default_factory=list)
+    not_found: List[str] = Field(default_factory=list)
+
+
+class OrderSummaryOut(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    order_number: str
+    session_id: str
+    photo_count: int
+    currency: str
+    total_amount: float
+    status: str
+    created_at: Timestamp
+    printed_at: Optional[Timestamp] = None
+    cancelled_at: Optional[Timestamp] = None
+
+
+class OrderListOut(BaseModel):
+    orders: List[OrderSummaryOut] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class StatsBucketOut(BaseModel):
+    period: str
+    orders_count: int = 0
+    photos_count: int = 0
+    revenue: float = 0.0
+    printed_count: int = 0
+    avg_print_latency_seconds: Optional[float] = None
+    max_print_latency_seconds: Optional[float] = None
+
+
+class StatsOut(BaseModel):
+    granularity: str
+    date_from: str
+    date_to: str
+    totals: StatsBucketOut
+    buckets: List[StatsBucketOut] = Field(default_factory=list)
+
+
+def _rollup_keys(moment: datetime, tz: ZoneInfo) -> tuple[str, str]:
+    local = moment.astimezone(tz)
+    return local.strftime("%Y-%m-%d"), local.strftime("%Y-%m-%dT%H")
+
+
+async def _bump_rollups(store_id: str, moment: datetime, inc: dict, maximums: Optional[dict] = None) -> None:
+    """Atomically add `inc` to the store's day and hour rollups containing `moment`."""
+    try:
+        day, hour = _rollup_keys(moment, await _store_tz(store_id))
+        await repo.bump_rollups(store_id, day, hour, inc, maximums)
+    except Exception:
+        # rollups are reporting only; never fail the kiosk request because of them
+        logger.exception("failed to update sales rollups for %s", moment.isoformat())
+
+
+def _stats_bucket(period: str, doc: dict) -> StatsBucketOut:
+    printed = int(doc.get("printed_count", 0))
+    latency_total = doc.get("print_latency_ms_total", 0)
+    latency_max = doc.get("print_latency_ms_max")
+    return StatsBucketOut(
+        period=period,
+        orders_count=int(doc.get("orders_count", 0)),
+        photos_count=int(doc.get("photos_count", 0)),
+        revenue=round(doc.get("revenue_cents", 0) / 100, 2),
+        printed_count=printed,
+        avg_print_latency_seconds=round(latency_total / printed / 1000, 1) if printed else None,
+        max_print_latency_seconds=round(latency_max / 1000, 1) if latency_max is not None else None,
+    )
+
+
+def _client_id(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS:
+        hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+async def _shared_window_wait(policy: RatePolicy, client: str) -> float:
+    """One-minute fixed window shared by all workers; seconds to wait, 0 if allowed."""
+    now = time.time()
+    window = int(now // 60)
+    try:
+        count = await repo.reserve_sequence(
+            f"rate:{policy.name}:{client}:{window}",
+            1,
+            purge_at=datetime.fromtimestamp((window + 2) * 60, timezone.utc),
+        )
+    except Exception:
+        # fail open: a store hiccup must not lock kiosks out
+        logger.exception("shared rate limit counter unavailable")
+        return 0.0
+    if count > max(policy.per_minute, policy.burst):
+        return (window + 1) * 60 - now
+    return 0.0
+
+
+def _throttle(policy: RatePolicy):
+    async def dependency(request: Request):
+        if policy.sheddable and loop_lag.overloaded:
+            loop_lag.shed += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado. Tente novamente em instantes.",
+                headers={"Retry-After": "1"},
+            )
+        if TRUSTED_PROXY_HOPS is None:
+            return
+        client = _client_id(request)
+        wait = rate_limiter.acquire(policy, client)
+        if not wait and RATE_LIMIT_SHARED:
+            wait = await _shared_window_wait(policy, client)
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas tentativas. Aguarde um momento.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return Depends(dependency)
+
+
+def _store_id(request: Request) -> str:
+    store_id = request.headers.get("x-store-id") or DEFAULT_STORE_ID
+    if store_id not in STORE_IDS:
+        raise HTTPException(status_code=404, detail="Loja não encontrada")
+    return store_id
+
+
+StoreId = Annotated[str, Depends(_store_id)]
+
+
+@app.exception_handler(StoreUnavailable)
+async def store_unavailable(request: Request, exc: StoreUnavailable):
+    logger.warning("%s %s: %s", request.method, request.url.path, exc)
+    return JSONResponse(
+        {"detail": "Banco de dados indisponível. Tente novamente em instantes."},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
 
 
 @api_router.get("/")
@@ -151,65 +443,89 @@ async def root():
     return {"message": "Photo Kiosk API"}
 
 
+@api_router.get("/ready")
+async def ready():
+    # load balancers keep cold workers out of rotation until warm-up is done
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+
 @api_router.get("/settings", response_model=SettingsOut)
-async def get_settings():
-    settings = await _ensure_global_settings()
+async def get_settings(store_id: StoreId):
+    settings = await _ensure_store_settings(store_id)
     # do not expose admin_pin
     safe = {k: v for k, v in settings.items() if k != "admin_pin"}
     return SettingsOut(**safe)
 
 
 @api_router.put("/settings", response_model=SettingsOut)
-async def update_settings(payload: SettingsUpdateIn):
-    current = await _ensure_global_settings()
+async def update_settings(payload: SettingsUpdateIn, store_id: StoreId):
+    current = await _ensure_store_settings(store_id)
     update = {k: v for k, v in payload.model_dump().items() if v is not None}
     if not update:
         safe = {k: v for k, v in current.items() if k != "admin_pin"}
         return SettingsOut(**safe)
+    if "timezone" in update:
+        try:
+            ZoneInfo(update["timezone"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise HTTPException(status_code=400, detail="Fuso horário inválido")
 
-    update["updated_at"] = _now_iso()
+    update["updated_at"] = _now()
 
-    await db.settings.update_one({"key": "global"}, {"$set": update}, upsert=True)
-    merged = {**current, **update}
-    merged.pop("_id", None)
+    await repo.update_settings(store_id, update)
+    merged = _cache_settings(store_id, {**current, **update})
     safe = {k: v for k, v in merged.items() if k != "admin_pin"}
     return SettingsOut(**safe)
 
 
-@api_router.post("/admin/verify-pin")
-async def admin_verify_pin(payload: AdminVerifyIn):
-    settings = await _ensure_global_settings()
+@api_router.post("/admin/verify-pin", dependencies=[_throttle(PIN_RATE)])
+async def admin_verify_pin(payload: AdminVerifyIn, store_id: StoreId):
+    settings = await _ensure_store_settings(store_id)
     ok = payload.pin == settings.get("admin_pin", "1234")
     return {"ok": ok}
 
 
-@api_router.post("/sessions", response_model=SessionCreateOut)
-async def create_session():
+@api_router.post("/sessions", response_model=SessionCreateOut, dependencies=[_throttle(SESSION_RATE)])
+async def create_session(store_id: StoreId):
     session_id = uuid.uuid4().hex
-    created_at = _now_iso()
-    expires_at = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    created_at = _now()
+    expires_at = created_at + SESSION_DURATION
 
     doc = {
+        "store_id": store_id,
         "session_id": session_id,
         "status": "active",
         "created_at": created_at,
         "expires_at": expires_at,
     }
-    await db.sessions.insert_one(doc)
+    await repo.insert_session(doc)
+    session_cache.put((store_id, session_id), doc)
     return SessionCreateOut(
         session_id=session_id,
-        upload_path=f"/upload/{session_id}",
+        # the customer's phone has no store of its own: the link carries it
+        upload_path=f"/upload/{session_id}?store={store_id}",
         created_at=created_at,
         expires_at=expires_at,
     )
 
 
-async def _get_session_doc(session_id: str) -> dict:
-    doc = await db.sessions.find_one({"session_id": session_id}, {"_id": 0})
+session_cache = SessionCache(
+    max_entries=int(os.environ.get("SESSION_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "30")),
+    negative_ttl=float(os.environ.get("SESSION_CACHE_NEGATIVE_TTL_SECONDS", "5")),
+    purge_grace=SESSION_TTL_GRACE,
+)
+
+
+async def _get_session_doc(store_id: str, session_id: str) -> dict:
+    found, doc = session_cache.get((store_id, session_id))
+    if not found:
+        doc = await repo.get_session(store_id, session_id)
+        session_cache.put((store_id, session_id), doc)
     if not doc:
         raise HTTPException(status_code=404, detail="Sessão não encontrada")
     try:
-        if datetime.fromisoformat(doc["expires_at"]) < datetime.now(timezone.utc):
+        if as_datetime(doc["expires_at"]) < datetime.now(timezone.utc):
             raise HTTPException(status_code=410, detail="Sessão expirada")
     except ValueError:
         pass
@@ -217,9 +533,9 @@ async def _get_session_doc(session_id: str) -> dict:
 
 
 @api_router.get("/sessions/{session_id}", response_model=SessionWithPhotosOut)
-async def get_session(session_id: str):
-    session = await _get_session_doc(session_id)
-    photos = await db.photos.find({"session_id": session_id}, {"_id": 0}).sort("created_at", 1).to_list(5000)
+async def get_session(session_id: str, store_id: StoreId):
+    session = await _get_session_doc(store_id, session_id)
+    photos = await repo.list_session_photos(store_id, session_id)
     photos_out = [PhotoOut(**p) for p in photos]
 
     last_uploaded_at = photos_out[-1].created_at if photos_out else None
@@ -236,15 +552,15 @@ async def get_session(session_id: str):
 
 
 @api_router.get("/sessions/{session_id}/photos", response_model=List[PhotoOut])
-async def list_session_photos(session_id: str):
-    _ = await _get_session_doc(session_id)
-    photos = await db.photos.find({"session_id": session_id}, {"_id": 0}).sort("created_at", 1).to_list(5000)
+async def list_session_photos(session_id: str, store_id: StoreId):
+    _ = await _get_session_doc(store_id, session_id)
+    photos = await repo.list_session_photos(store_id, session_id)
     return [PhotoOut(**p) for p in photos]
 
 
 @api_router.post("/sessions/{session_id}/photos", response_model=List[PhotoOut])
-async def upload_photos(session_id: str, files: List[UploadFile] = File(...)):
-    _ = await _get_session_doc(session_id)
+async def upload_photos(session_id: str, store_id: StoreId, files: List[UploadFile] = File(...)):
+    session = await _get_session_doc(store_id, session_id)
     if not files:
         raise HTTPException(status_code=400, detail="Nenhum arquivo enviado")
 
@@ -256,8 +572,6 @@ async def upload_photos(session_id: str, files: List[UploadFile] = File(...)):
 
         suffix = Path(original_name).suffix.lower()
         if not suffix:
-            import mimetypes
-
             guessed = mimetypes.guess_extension(content_type) or ""
             suffix = guessed if guessed else ""
 
@@ -273,10 +587,11 @@ async def upload_photos(session_id: str, files: List[UploadFile] = File(...)):
                 size += len(chunk)
                 out.write(chunk)
 
-        created_at = _now_iso()
+        created_at = _now()
         photo_id = uuid.uuid4().hex
 
         doc = {
+            "store_id": store_id,
             "photo_id": photo_id,
             "session_id": session_id,
             "file_key": file_key,
@@ -285,49 +600,65 @@ async def upload_photos(session_id: str, files: List[UploadFile] = File(...)):
             "size_bytes": int(size),
             "url_path": f"/api/uploads/{file_key}",
             "created_at": created_at,
+            "purge_at": as_datetime(session["expires_at"]) + PHOTO_RETENTION,
         }
-        await db.photos.insert_one(doc)
+        await repo.insert_photo(doc)
         created.append(PhotoOut(**doc))
 
     return created
 
 
-@api_router.get("/uploads/{file_key}")
-async def get_upload(file_key: str):
+def _upload_file(file_key: str) -> Path:
     safe = _safe_filename(file_key)
     path = (UPLOAD_DIR / safe).resolve()
     if not str(path).startswith(str(UPLOAD_DIR.resolve())):
         raise HTTPException(status_code=400, detail="Arquivo inválido")
     if not path.exists():
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    return path
+
+
+# file keys are random and never rewritten, so the browser may keep them as long as the
+# photo exists; customer photos stay out of shared proxies and CDNs
+UPLOAD_CACHE_CONTROL = f"private, max-age={int(PHOTO_RETENTION.total_seconds())}, immutable"
+
+
+@api_router.get("/uploads/{file_key}")
+async def get_upload(file_key: str):
+    path = _upload_file(file_key)
 
     media_type = None
     try:
-        import mimetypes
-
         media_type = mimetypes.guess_type(str(path))[0]
     except Exception:
         media_type = None
 
-    return FileResponse(path, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": UPLOAD_CACHE_CONTROL})
 
 
-def _order_number() -> str:
-    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
-    return f"APF-{stamp}-{uuid.uuid4().hex[:6].upper()}"
+order_numbers = OrderNumberAllocator(
+    repo,
+    prefix=os.environ.get("ORDER_NUMBER_PREFIX", "APF"),
+    block_size=int(os.environ.get("ORDER_NUMBER_BLOCK_SIZE", "20")),
+    # keeps numbering orders through a short store outage
+    reserve_ahead=journaled_repo is not None,
+)
 
+print_prefetch = PrintPrefetcher(
+    workers=int(os.environ.get("PRINT_PREFETCH_WORKERS", "2")),
+    max_entries=int(os.environ.get("PRINT_PREFETCH_CACHE_SIZE", "512")),
+    # long enough to cover the walk to the till and a reprint or two
+    ttl=float(os.environ.get("PRINT_PREFETCH_TTL_SECONDS", "1800")),
+)
 
-@api_router.post("/sessions/{session_id}/orders", response_model=OrderOut)
-async def create_order(session_id: str, payload: OrderCreateIn):
-    _ = await _get_session_doc(session_id)
 
-    settings = await _ensure_global_settings()
+@api_router.post("/sessions/{session_id}/orders", response_model=OrderOut)
+async def create_order(session_id: str, payload: OrderCreateIn, store_id: StoreId):
+    _ = await _get_session_doc(store_id, session_id)
 
-    q = {"session_id": session_id}
-    if payload.selected_photo_ids:
-        q["photo_id"] = {"$in": payload.selected_photo_ids}
+    settings = await _ensure_store_settings(store_id)
 
-    photos = await db.photos.find(q, {"_id": 0}).sort("created_at", 1).to_list(5000)
+    photos = await repo.list_session_photos(store_id, session_id, payload.selected_photo_ids)
     if not photos:
         raise HTTPException(status_code=400, detail="Nenhuma foto para imprimir")
 
@@ -336,10 +667,11 @@ async def create_order(session_id: str, payload: OrderCreateIn):
     price = float(settings.get("price_per_photo", 2.50))
     total = round(price * len(photos_out), 2)
 
-    order_number = _order_number()
-    created_at = _now_iso()
+    order_number = await order_numbers.next(store_id, _zone(settings))
+    created_at = _now()
 
     doc = {
+        "store_id": store_id,
         "order_number": order_number,
         "session_id": session_id,
         "photo_ids": [p.photo_id for p in photos_out],
@@ -353,45 +685,307 @@ async def create_order(session_id: str, payload: OrderCreateIn):
         "created_at": created_at,
         "printed_at": None,
     }
-    await db.orders.insert_one(doc)
+    await repo.insert_order(doc)
+    await _bump_rollups(
+        store_id,
+        created_at,
+        {"orders_count": 1, "photos_count": len(photos_out), "revenue_cents": int(round(total * 100))},
+    )
+
+    async def warm_print_assets():
+        return photos_out, [_upload_file(p.file_key) for p in photos_out]
 
-    return OrderOut(**{**doc, "photos": photos_out})
+    prefetch_status = print_prefetch.enqueue((store_id, order_number), warm_print_assets)
+    return OrderOut(**{**doc, "photos": photos_out, "prefetch_status": prefetch_status})
+
+
+def _encode_cursor(doc: dict) -> str:
+    raw = f"{as_datetime(doc['created_at']).isoformat()}|{doc['order_number']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_number = raw.split("|", 1)
+        return as_datetime(created_at), order_number
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _date_bound(value: str, end: bool, tz: ZoneInfo) -> datetime:
+    """ISO date (store calendar) or datetime -> UTC bound for created_at.
+
+    End bounds are exclusive: a bare date covers the whole day and a
+    datetime is included up to its millisecond.
+    """
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value) + timedelta(days=1 if end else 0)
+            moment = datetime.combine(day, datetime.min.time(), tzinfo=tz)
+        else:
+            moment = datetime.fromisoformat(value)
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=tz)
+            if end:
+                moment += timedelta(milliseconds=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida (use AAAA-MM-DD)")
+    return moment.astimezone(timezone.utc)
+
+
+@api_router.get("/orders", response_model=OrderListOut)
+async def list_orders(
+    store_id: StoreId,
+    status: Optional[str] = None,
+    session_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    tz = await _store_tz(store_id) if date_from or date_to else DEFAULT_TZ
+    docs = await repo.list_orders(
+        store_id,
+        status=status,
+        session_id=session_id,
+        created_from=_date_bound(date_from, end=False, tz=tz) if date_from else None,
+        created_before=_date_bound(date_to, end=True, tz=tz) if date_to else None,
+        after=_decode_cursor(cursor) if cursor else None,
+        ascending=order == "asc",
+        limit=limit + 1,
+        fields=OrderSummaryOut.model_fields,
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return OrderListOut(
+        orders=[OrderSummaryOut(**d) for d in docs],
+        next_cursor=_encode_cursor(docs[-1]) if has_more else None,
+    )
+
+
+async def _orders_out(store_id: str, docs: List[dict]) -> List[OrderOut]:
+    """Attach photos, in order, to any number of orders with one batched lookup.
+
+    Orders whose photos the print prefetch already holds skip the lookup;
+    status fields always come from `docs`.
+    """
+    cached = {d["order_number"]: print_prefetch.payload((store_id, d["order_number"])) for d in docs}
+    photo_ids = list({pid for d in docs if cached[d["order_number"]] is None for pid in d.get("photo_ids", [])})
+    by_id = {p["photo_id"]: PhotoOut(**p) for p in await repo.get_photos(store_id, photo_ids)} if photo_ids else {}
+    return [
+        OrderOut(
+            **{
+                **d,
+                "photos": cached[d["order_number"]]
+                or [by_id[pid] for pid in d.get("photo_ids", []) if pid in by_id],
+                "prefetch_status": print_prefetch.status((store_id, d["order_number"])),
+            }
+        )
+        for d in docs
+    ]
+
+
+def _print_latency_ms(order: dict, printed_at: datetime) -> int:
+    try:
+        return max(0, int((printed_at - as_datetime(order["created_at"])).total_seconds() * 1000))
+    except (KeyError, ValueError):
+        return 0
+
+
+async def _record_prints(store_id: str, orders: List[dict], printed_at: datetime) -> None:
+    if not orders:
+        return
+    latencies = [_print_latency_ms(o, printed_at) for o in orders]
+    await _bump_rollups(
+        store_id,
+        printed_at,
+        {"printed_count": len(latencies), "print_latency_ms_total": sum(latencies)},
+        {"print_latency_ms_max": max(latencies)},
+    )
+
+
+async def _bulk_result(
+    store_id: str, numbers: List[str], docs: List[dict], changed: Optional[set] = None
+) -> BulkOrdersOut:
+    by_number = {d["order_number"]: d for d in docs}
+    return BulkOrdersOut(
+        orders=await _orders_out(store_id, [by_number[n] for n in numbers if n in by_number]),
+        changed=[n for n in numbers if n in (changed or ())],
+        not_found=[n for n in numbers if n not in by_number],
+    )
+
+
+# declared before /orders/{order_number}/... so "bulk" is not taken for an order number
+@api_router.post("/orders/bulk/get", response_model=BulkOrdersOut)
+async def bulk_get_orders(payload: OrderNumbersIn, store_id: StoreId):
+    numbers = list(dict.fromkeys(payload.order_numbers))
+    return await _bulk_result(store_id, numbers, await repo.get_orders(store_id, numbers))
+
+
+@api_router.post("/orders/bulk/mark-printed", response_model=BulkOrdersOut)
+async def bulk_mark_orders_printed(payload: OrderNumbersIn, store_id: StoreId):
+    """Mark pending orders printed; orders already printed or cancelled are left as they are."""
+    numbers = list(dict.fromkeys(payload.order_numbers))
+    printed_at = _now()
+    docs, changed = await repo.transition_orders(
+        store_id, numbers, ["pending_print"], "printed", {"printed_at": printed_at}
+    )
+    await _record_prints(store_id, [d for d in docs if d["order_number"] in changed], printed_at)
+    return await _bulk_result(store_id, numbers, docs, changed)
+
+
+@api_router.post("/orders/bulk/cancel", response_model=BulkOrdersOut)
+async def bulk_cancel_orders(payload: OrderNumbersIn, store_id: StoreId):
+    """Cancel pending orders and take them back out of the sales rollups."""
+    numbers = list(dict.fromkeys(payload.order_numbers))
+    docs, changed = await repo.transition_orders(
+        store_id, numbers, ["pending_print"], "cancelled", {"cancelled_at": _now()}
+    )
+
+    tz = await _store_tz(store_id)
+    reversals: dict = {}
+    for d in docs:
+        if d["order_number"] not in changed:
+            continue
+        created = as_datetime(d["created_at"])
+        _, inc = reversals.setdefault(
+            _rollup_keys(created, tz), (created, {"orders_count": 0, "photos_count": 0, "revenue_cents": 0})
+        )
+        inc["orders_count"] -= 1
+        inc["photos_count"] -= int(d.get("photo_count", 0))
+        inc["revenue_cents"] -= int(round(float(d.get("total_amount", 0)) * 100))
+    await asyncio.gather(*(_bump_rollups(store_id, moment, inc) for moment, inc in reversals.values()))
+
+    return await _bulk_result(store_id, numbers, docs, changed)
 
 
 @api_router.get("/orders/{order_number}", response_model=OrderOut)
-async def get_order(order_number: str):
-    doc = await db.orders.find_one({"order_number": order_number}, {"_id": 0})
+async def get_order(order_number: str, store_id: StoreId):
+    doc = await repo.get_order(store_id, order_number)
     if not doc:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-    photos = await db.photos.find({"photo_id": {"$in": doc.get("photo_ids", [])}}, {"_id": 0}).to_list(5000)
-    by_id = {p["photo_id"]: p for p in photos}
-    ordered = [by_id[pid] for pid in doc.get("photo_ids", []) if pid in by_id]
-    photos_out = [PhotoOut(**p) for p in ordered]
-
-    return OrderOut(**{**doc, "photos": photos_out})
+    (order,) = await _orders_out(store_id, [doc])
+    return order
 
 
 @api_router.post("/orders/{order_number}/mark-printed", response_model=OrderOut)
-async def mark_order_printed(order_number: str):
-    existing = await db.orders.find_one({"order_number": order_number}, {"_id": 0})
+async def mark_order_printed(order_number: str, store_id: StoreId):
+    printed_at = _now()
+    existing = await repo.mark_order_printed(store_id, order_number, printed_at)
     if not existing:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    if existing.get("status") == "cancelled":
+        raise HTTPException(status_code=409, detail="Pedido cancelado")
+
+    # only the first print counts; reprints just refresh printed_at
+    if existing.get("status") != "printed":
+        await _record_prints(store_id, [existing], printed_at)
+
+    (order,) = await _orders_out(store_id, [{**existing, "status": "printed", "printed_at": printed_at}])
+    return order
 
-    printed_at = _now_iso()
-    await db.orders.update_one(
-        {"order_number": order_number},
-        {"$set": {"status": "printed", "printed_at": printed_at}},
+
+@api_router.get("/admin/stats", response_model=StatsOut)
+async def admin_stats(
+    store_id: StoreId,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    granularity: str = Query("day", pattern="^(day|hour)$"),
+):
+    tz = await _store_tz(store_id)
+    try:
+        end = date.fromisoformat(date_to) if date_to else datetime.now(tz).date()
+        start = date.fromisoformat(date_from) if date_from else end - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida (use AAAA-MM-DD)")
+    if start > end:
+        raise HTTPException(status_code=400, detail="Intervalo de datas inválido")
+    max_days = 366 if granularity == "day" else 31
+    if (end - start).days >= max_days:
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo de {max_days} dias")
+
+    docs = await repo.get_rollups(store_id, granularity, start.isoformat(), end.isoformat())
+    buckets = [_stats_bucket(d[granularity], d) for d in docs]
+
+    counters = ("orders_count", "photos_count", "revenue_cents", "printed_count", "print_latency_ms_total")
+    totals = dict.fromkeys(counters, 0)
+    for d in docs:
+        for field in counters:
+            totals[field] += d.get(field, 0)
+        if d.get("print_latency_ms_max") is not None:
+            totals["print_latency_ms_max"] = max(totals.get("print_latency_ms_max", 0), d["print_latency_ms_max"])
+
+    return StatsOut(
+        granularity=granularity,
+        date_from=start.isoformat(),
+        date_to=end.isoformat(),
+        totals=_stats_bucket("total", totals),
+        buckets=buckets,
     )
 
-    updated = {**existing, "status": "printed", "printed_at": printed_at}
 
-    photos = await db.photos.find({"photo_id": {"$in": updated.get("photo_ids", [])}}, {"_id": 0}).to_list(5000)
-    by_id = {p["photo_id"]: p for p in photos}
-    ordered = [by_id[pid] for pid in updated.get("photo_ids", []) if pid in by_id]
-    photos_out = [PhotoOut(**p) for p in ordered]
+@api_router.get("/admin/diagnostics")
+async def admin_diagnostics():
+    diagnostics = {
+        "storage": repo.name,
+        "stores": sorted(STORE_IDS),
+        "warm_up": warmup.stats(),
+        "session_cache": session_cache.stats(),
+        "order_numbers": order_numbers.stats(),
+        "print_prefetch": print_prefetch.stats(),
+        "throttling": {
+            **rate_limiter.stats(),
+            "enabled": TRUSTED_PROXY_HOPS is not None,
+            "event_loop": loop_lag.stats(),
+        },
+    }
+    if journaled_repo is not None:
+        diagnostics["journal"] = journaled_repo.stats()
+    return diagnostics
+
+
+class ProfilingIn(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    slow_ms: Optional[float] = Field(default=None, ge=0)
+
+
+@api_router.get("/admin/profiling")
+async def get_profiling():
+    return profiler.stats()
+
+
+@api_router.put("/admin/profiling")
+async def update_profiling(payload: ProfilingIn):
+    if payload.sample_rate is not None:
+        profiler.sample_rate = payload.sample_rate
+    if payload.slow_ms is not None:
+        profiler.slow_ms = payload.slow_ms
+    if payload.enabled is True:
+        profiler.enable()
+    elif payload.enabled is False:
+        profiler.disable()
+    return profiler.stats()
+
+
+@api_router.get("/admin/profiles")
+async def list_profiles():
+    # newest first, without the stacks
+    return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(profiler.profiles)]
+
 
-    return OrderOut(**{**updated, "photos": photos_out})
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    profile = next((p for p in profiler.profiles if p["profile_id"] == profile_id), None)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    if format == "folded":
+        # Brendan Gregg's collapsed format, ready for flamegraph.pl / speedscope
+        return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items()))
+    return profile
 
 
 app.include_router(api_router)
@@ -403,8 +997,102 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+app.add_middleware(FirstRequestTimer, warmup=warmup, skip=("/api/ready",))
+
+
+PURGE_INTERVAL_SECONDS = 600
+
+
+async def _purge_expired_periodically() -> None:
+    # Mongo expires documents itself with TTL indexes; the embedded store needs a sweeper
+    while True:
+        try:
+            removed = await repo.purge_expired()
+            if removed:
+                logger.info("purged %d expired records", removed)
+        except Exception:
+            logger.exception("failed to purge expired records")
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
+
+
+async def _start_purging() -> None:
+    app.state.purge_task = asyncio.create_task(_purge_expired_periodically())
+
+
+async def _load_store_settings() -> None:
+    await asyncio.gather(*(_ensure_store_settings(store_id) for store_id in STORE_IDS))
+
+
+async def _prime_order_numbers() -> None:
+    await order_numbers.prime({store_id: await _store_tz(store_id) for store_id in STORE_IDS})
+
+
+async def _load_mime_types() -> None:
+    # reads the system mime.types once instead of on the first upload
+    mimetypes.init()
+
+
+@app.on_event("startup")
+async def startup_storage():
+    logger.info("storage backend: %s", repo.name)
+    app.state.purge_task = None
+    if journaled_repo is not None:
+        # accept writes even if the store is down; fails if another worker holds the journal
+        await journaled_repo.open()
+    app.state.warmup_task = asyncio.create_task(
+        warmup.run(
+            [
+                ("schema", repo.ensure_schema),
+                ("pool", lambda: repo.warm_up(MONGO_MIN_POOL_SIZE)),
+                ("settings", _load_store_settings),
+                ("mime_types", _load_mime_types),
+                ("order_numbers", _prime_order_numbers),
+                ("purge", _start_purging),
+            ]
+        )
+    )
+    # normally the worker is warm before it accepts connections; if the store is down it
+    # starts anyway and keeps /api/ready at 503 while warm-up retries
+    await asyncio.wait({app.state.warmup_task}, timeout=WARM_UP_STARTUP_WAIT)
+
+
+@app.on_event("startup")
+async def start_load_monitor():
+    loop_lag.start()
+    if TRUSTED_PROXY_HOPS is None:
+        logger.warning("TRUSTED_PROXY_HOPS is not set: session and PIN rate limits are off")
+
+
+@app.on_event("startup")
+async def start_print_prefetch():
+    print_prefetch.start()
+
+
+@app.on_event("startup")
+async def start_profiler():
+    if PROFILING_ENABLED:
+        profiler.enable()
+
+
+@app.on_event("shutdown")
+async def stop_load_monitor():
+    loop_lag.stop()
+
+
+@app.on_event("shutdown")
+async def stop_profiler():
+    profiler.disable()
+
+
+@app.on_event("shutdown")
+async def stop_print_prefetch():
+    await print_prefetch.stop()
 
 
 @app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def shutdown_storage():
+    app.state.warmup_task.cancel()
+    if app.state.purge_task is not None:
+        app.state.purge_task.cancel()
+    await repo.close()
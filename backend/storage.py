@@ -0,0 +1,901 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import json
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+
+ROLLUP_COUNTERS = ("orders_count", "photos_count", "revenue_cents", "printed_count", "print_latency_ms_total")
+ROLLUP_MAXIMUMS = ("print_latency_ms_max",)
+TIMESTAMP_FIELDS = frozenset({"created_at", "expires_at", "printed_at", "cancelled_at", "updated_at", "purge_at"})
+
+
+class StoreUnavailable(Exception):
+    """The store did not answer in time; callers may serve what they have or answer 503."""
+
+
+class Repository(abc.ABC):
+    """Persistence used by the API.
+
+    Documents are plain dicts without `_id`; timestamps are aware UTC
+    datetimes. `after` cursors are (created_at, order_number) pairs.
+    Every document carries a `store_id` and every lookup is scoped to one
+    store; session, photo and order ids are only unique within a store.
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    async def ensure_schema(self) -> None:
+        """Create tables/indexes; safe to call on every startup."""
+
+    async def purge_expired(self) -> int:
+        """Drop expired sessions, photos and counters; returns rows removed."""
+        return 0
+
+    async def warm_up(self, connections: int) -> None:
+        """Open up to `connections` connections ahead of the first requests."""
+
+    async def close(self) -> None:
+        pass
+
+    # settings
+    @abc.abstractmethod
+    async def get_settings(self, store_id: str) -> Optional[dict]: ...
+
+    @abc.abstractmethod
+    async def insert_settings(self, doc: dict) -> None:
+        """Create the store's settings unless they already exist; safe to race."""
+
+    @abc.abstractmethod
+    async def update_settings(self, store_id: str, fields: dict) -> None: ...
+
+    # sessions
+    @abc.abstractmethod
+    async def insert_session(self, doc: dict) -> None: ...
+
+    @abc.abstractmethod
+    async def save_session(self, doc: dict) -> None:
+        """Insert or replace by (store_id, session_id); idempotent, used when replaying writes."""
+
+    @abc.abstractmethod
+    async def get_session(self, store_id: str, session_id: str) -> Optional[dict]: ...
+
+    # photos
+    @abc.abstractmethod
+    async def insert_photo(self, doc: dict) -> None: ...
+
+    @abc.abstractmethod
+    async def save_photo(self, doc: dict) -> None:
+        """Insert or replace by (store_id, photo_id); idempotent, used when replaying writes."""
+
+    @abc.abstractmethod
+    async def list_session_photos(
+        self, store_id: str, session_id: str, photo_ids: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """Photos of a session, oldest first, optionally restricted to `photo_ids`."""
+
+    @abc.abstractmethod
+    async def get_photos(self, store_id: str, photo_ids: Sequence[str]) -> List[dict]:
+        """Photos by id, in no particular order; unknown ids are skipped."""
+
+    # orders
+    @abc.abstractmethod
+    async def insert_order(self, doc: dict) -> None: ...
+
+    @abc.abstractmethod
+    async def save_order(self, doc: dict) -> None:
+        """Insert or replace by (store_id, order_number); idempotent, used when replaying writes."""
+
+    @abc.abstractmethod
+    async def get_order(self, store_id: str, order_number: str) -> Optional[dict]: ...
+
+    @abc.abstractmethod
+    async def get_orders(self, store_id: str, order_numbers: Sequence[str]) -> List[dict]:
+        """Orders by number, in no particular order; unknown numbers are skipped."""
+
+    @abc.abstractmethod
+    async def mark_order_printed(self, store_id: str, order_number: str, printed_at: datetime) -> Optional[dict]:
+        """Set status/printed_at atomically and return the order as it was before.
+
+        Cancelled orders are left as they are; the caller sees that from the
+        returned status.
+        """
+
+    @abc.abstractmethod
+    async def transition_orders(
+        self, store_id: str, order_numbers: Sequence[str], from_statuses: Sequence[str], status: str, fields: dict
+    ) -> tuple[List[dict], set]:
+        """Move the listed orders currently in `from_statuses` to `status`, also setting `fields`.
+
+        Returns every listed order as it is afterwards and the numbers this
+        call changed, so concurrent callers never both claim an order.
+        """
+
+    @abc.abstractmethod
+    async def list_orders(
+        self,
+        store_id: str,
+        *,
+        status: Optional[str] = None,
+        session_id: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        after: Optional[tuple[datetime, str]] = None,
+        ascending: bool = False,
+        limit: int = 50,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        """Orders sorted by (created_at, order_number), keyset-paginated by `after`."""
+
+    # counters
+    @abc.abstractmethod
+    async def reserve_sequence(self, name: str, count: int, purge_at: datetime) -> int:
+        """Atomically advance counter `name` by `count` and return its new value."""
+
+    # rollups
+    @abc.abstractmethod
+    async def bump_rollups(
+        self, store_id: str, day: str, hour: str, inc: dict, maximums: Optional[dict] = None
+    ) -> None:
+        """Add `inc` (and raise `maximums`) on the store's day and hour rollups."""
+
+    @abc.abstractmethod
+    async def get_rollups(self, store_id: str, granularity: str, day_from: str, day_to: str) -> List[dict]:
+        """Day or hour rollups whose day is within [day_from, day_to], sorted."""
+
+
+# shard keys matching the unique indexes below; all lead with store_id so one store's
+# reads stay on the shards holding its range
+SHARD_KEYS = {
+    "sessions": {"store_id": 1, "session_id": 1},
+    "photos": {"store_id": 1, "photo_id": 1},
+    "orders": {"store_id": 1, "order_number": 1},
+    "stats_daily": {"store_id": 1, "day": 1},
+    "stats_hourly": {"store_id": 1, "hour": 1},
+}
+
+# single-store indexes replaced by the store_id-prefixed ones
+_LEGACY_INDEXES = {
+    "sessions": ["session_id_1"],
+    "photos": ["photo_id_1", "session_id_1_created_at_1"],
+    "orders": [
+        "order_number_1",
+        "created_at_-1_order_number_-1",
+        "status_1_created_at_-1_order_number_-1",
+        "session_id_1_created_at_-1_order_number_-1",
+    ],
+    "stats_daily": ["day_1"],
+    "stats_hourly": ["hour_1", "day_1"],
+}
+
+
+class MotorRepository(Repository):
+    """MongoDB through Motor; expiry is left to TTL indexes."""
+
+    name = "mongo"
+
+    def __init__(self, mongo_url: str, db_name: str, session_ttl_grace: timedelta, **client_options):
+        self.client = AsyncIOMotorClient(mongo_url, tz_aware=True, **client_options)
+        self.db = self.client[db_name]
+        self.session_ttl_grace = session_ttl_grace
+
+    async def _ensure_ttl_index(self, collection, field: str, expire_after: timedelta) -> None:
+        seconds = int(expire_after.total_seconds())
+        try:
+            await collection.create_index(field, expireAfterSeconds=seconds)
+        except OperationFailure as exc:
+            if exc.code != 85:  # IndexOptionsConflict: the configured TTL changed
+                raise
+            await self.db.command(
+                "collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+            )
+
+    async def ensure_schema(self) -> None:
+        db = self.db
+        await self._ensure_ttl_index(db.sessions, "expires_at", self.session_ttl_grace)
+        await self._ensure_ttl_index(db.photos, "purge_at", timedelta(0))
+        await self._ensure_ttl_index(db.counters, "purge_at", timedelta(0))
+        await db.settings.create_index("store_id", unique=True)
+        await db.sessions.create_index([("store_id", 1), ("session_id", 1)], unique=True)
+        await db.photos.create_index([("store_id", 1), ("photo_id", 1)], unique=True)
+        await db.photos.create_index([("store_id", 1), ("session_id", 1), ("created_at", 1)])
+        await db.stats_daily.create_index([("store_id", 1), ("day", 1)], unique=True)
+        await db.stats_hourly.create_index([("store_id", 1), ("hour", 1)], unique=True)
+        await db.stats_hourly.create_index([("store_id", 1), ("day", 1)])
+        await db.orders.create_index([("store_id", 1), ("order_number", 1)], unique=True)
+        # keyset pagination of /orders: equality filters first, then the sort keys
+        await db.orders.create_index([("store_id", 1), ("created_at", -1), ("order_number", -1)])
+        await db.orders.create_index([("store_id", 1), ("status", 1), ("created_at", -1), ("order_number", -1)])
+        await db.orders.create_index([("store_id", 1), ("session_id", 1), ("created_at", -1), ("order_number", -1)])
+        for collection, names in _LEGACY_INDEXES.items():
+            for index in names:
+                try:
+                    await db[collection].drop_index(index)
+                except OperationFailure as exc:
+                    if exc.code not in (26, 27):  # NamespaceNotFound, IndexNotFound
+                        raise
+
+    async def warm_up(self, connections: int) -> None:
+        # concurrent pings make the pool open that many sockets now instead of under the first requests
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(max(connections, 1))))
+
+    async def close(self) -> None:
+        self.client.close()
+
+    async def get_settings(self, store_id: str) -> Optional[dict]:
+        return await self.db.settings.find_one({"store_id": store_id}, {"_id": 0})
+
+    async def insert_settings(self, doc: dict) -> None:
+        await self.db.settings.update_one({"store_id": doc["store_id"]}, {"$setOnInsert": doc}, upsert=True)
+
+    async def update_settings(self, store_id: str, fields: dict) -> None:
+        await self.db.settings.update_one({"store_id": store_id}, {"$set": fields}, upsert=True)
+
+    async def insert_session(self, doc: dict) -> None:
+        await self.db.sessions.insert_one(dict(doc))
+
+    async def save_session(self, doc: dict) -> None:
+        await self.db.sessions.replace_one(
+            {"store_id": doc["store_id"], "session_id": doc["session_id"]}, doc, upsert=True
+        )
+
+    async def get_session(self, store_id: str, session_id: str) -> Optional[dict]:
+        return await self.db.sessions.find_one({"store_id": store_id, "session_id": session_id}, {"_id": 0})
+
+    async def insert_photo(self, doc: dict) -> None:
+        await self.db.photos.insert_one(dict(doc))
+
+    async def save_photo(self, doc: dict) -> None:
+        await self.db.photos.replace_one(
+            {"store_id": doc["store_id"], "photo_id": doc["photo_id"]}, doc, upsert=True
+        )
+
+    async def list_session_photos(
+        self, store_id: str, session_id: str, photo_ids: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        q: dict = {"store_id": store_id, "session_id": session_id}
+        if photo_ids:
+            q["photo_id"] = {"$in": list(photo_ids)}
+        return await self.db.photos.find(q, {"_id": 0}).sort("created_at", 1).to_list(5000)
+
+    async def get_photos(self, store_id: str, photo_ids: Sequence[str]) -> List[dict]:
+        if not photo_ids:
+            return []
+        return await self.db.photos.find(
+            {"store_id": store_id, "photo_id": {"$in": list(photo_ids)}}, {"_id": 0}
+        ).to_list(None)
+
+    async def insert_order(self, doc: dict) -> None:
+        await self.db.orders.insert_one(dict(doc))
+
+    async def save_order(self, doc: dict) -> None:
+        await self.db.orders.replace_one(
+            {"store_id": doc["store_id"], "order_number": doc["order_number"]}, doc, upsert=True
+        )
+
+    async def get_order(self, store_id: str, order_number: str) -> Optional[dict]:
+        return await self.db.orders.find_one({"store_id": store_id, "order_number": order_number}, {"_id": 0})
+
+    async def get_orders(self, store_id: str, order_numbers: Sequence[str]) -> List[dict]:
+        if not order_numbers:
+            return []
+        return await self.db.orders.find(
+            {"store_id": store_id, "order_number": {"$in": list(order_numbers)}}, {"_id": 0}
+        ).to_list(None)
+
+    async def transition_orders(
+        self, store_id: str, order_numbers: Sequence[str], from_statuses: Sequence[str], status: str, fields: dict
+    ) -> tuple[List[dict], set]:
+        # tag the documents this update_many touches so the follow-up read can tell them apart
+        token = uuid.uuid4().hex
+        numbers = {"$in": list(order_numbers)}
+        await self.db.orders.update_many(
+            {"store_id": store_id, "order_number": numbers, "status": {"$in": list(from_statuses)}},
+            {"$set": {**fields, "status": status, "transition_id": token}},
+        )
+        docs = await self.get_orders(store_id, order_numbers)
+        changed = {d["order_number"] for d in docs if d.pop("transition_id", None) == token}
+        if changed:
+            # the tag is bookkeeping for this call only
+            await self.db.orders.update_many(
+                {"store_id": store_id, "order_number": numbers, "transition_id": token},
+                {"$unset": {"transition_id": ""}},
+            )
+        return docs, changed
+
+    async def mark_order_printed(self, store_id: str, order_number: str, printed_at: datetime) -> Optional[dict]:
+        before = await self.db.orders.find_one_and_update(
+            {"store_id": store_id, "order_number": order_number, "status": {"$ne": "cancelled"}},
+            {"$set": {"status": "printed", "printed_at": printed_at}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+        # missing or cancelled
+        return before or await self.get_order(store_id, order_number)
+
+    async def list_orders(
+        self,
+        store_id: str,
+        *,
+        status: Optional[str] = None,
+        session_id: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        after: Optional[tuple[datetime, str]] = None,
+        ascending: bool = False,
+        limit: int = 50,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        q: dict = {"store_id": store_id}
+        if status:
+            q["status"] = status
+        if session_id:
+            q["session_id"] = session_id
+        created_range = {}
+        if created_from:
+            created_range["$gte"] = created_from
+        if created_before:
+            created_range["$lt"] = created_before
+        if created_range:
+            q["created_at"] = created_range
+        if after:
+            op = "$gt" if ascending else "$lt"
+            keyset = {"$or": [{"created_at": {op: after[0]}}, {"created_at": after[0], "order_number": {op: after[1]}}]}
+            q = {"$and": [q, keyset]}
+
+        projection = {"_id": 0, **({f: 1 for f in fields} if fields else {})}
+        direction = 1 if ascending else -1
+        return (
+            await self.db.orders.find(q, projection)
+            .sort([("created_at", direction), ("order_number", direction)])
+            .limit(limit)
+            .to_list(limit)
+        )
+
+    async def reserve_sequence(self, name: str, count: int, purge_at: datetime) -> int:
+        counter = await self.db.counters.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}, "$setOnInsert": {"purge_at": purge_at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["seq"]
+
+    async def bump_rollups(
+        self, store_id: str, day: str, hour: str, inc: dict, maximums: Optional[dict] = None
+    ) -> None:
+        update = {"$inc": inc}
+        if maximums:
+            update["$max"] = maximums
+        await asyncio.gather(
+            self.db.stats_daily.update_one({"store_id": store_id, "day": day}, update, upsert=True),
+            self.db.stats_hourly.update_one(
+                {"store_id": store_id, "hour": hour}, {**update, "$setOnInsert": {"day": day}}, upsert=True
+            ),
+        )
+
+    async def get_rollups(self, store_id: str, granularity: str, day_from: str, day_to: str) -> List[dict]:
+        collection = self.db.stats_daily if granularity == "day" else self.db.stats_hourly
+        return (
+            await collection.find({"store_id": store_id, "day": {"$gte": day_from, "$lte": day_to}}, {"_id": 0})
+            .sort(granularity, 1)
+            .to_list(None)
+        )
+
+
+def _ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_hook(obj: dict) -> dict:
+    for key in TIMESTAMP_FIELDS.intersection(obj):
+        if isinstance(obj[key], str):
+            obj[key] = datetime.fromisoformat(obj[key])
+    return obj
+
+
+def as_datetime(value) -> datetime:
+    """Stored timestamp -> aware UTC datetime; tolerates ISO strings not yet migrated."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def dump_doc(doc: dict) -> str:
+    return json.dumps({k: v for k, v in doc.items() if k != "_id"}, default=_json_default)
+
+
+def load_doc(raw: str) -> dict:
+    return json.loads(raw, object_hook=_json_hook)
+
+
+_SQLITE_SCHEMA_VERSION = 1
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (store_id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sessions (
+    store_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (store_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+CREATE TABLE IF NOT EXISTS photos (
+    store_id TEXT NOT NULL,
+    photo_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    purge_at INTEGER,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (store_id, photo_id)
+);
+CREATE INDEX IF NOT EXISTS photos_session ON photos (store_id, session_id, created_at);
+CREATE INDEX IF NOT EXISTS photos_purge_at ON photos (purge_at);
+CREATE TABLE IF NOT EXISTS orders (
+    store_id TEXT NOT NULL,
+    order_number TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (store_id, order_number)
+);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (store_id, created_at, order_number);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (store_id, status, created_at, order_number);
+CREATE INDEX IF NOT EXISTS orders_session ON orders (store_id, session_id, created_at, order_number);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, seq INTEGER NOT NULL, purge_at INTEGER);
+CREATE TABLE IF NOT EXISTS stats_daily (
+    store_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    photos_count INTEGER NOT NULL DEFAULT 0,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    printed_count INTEGER NOT NULL DEFAULT 0,
+    print_latency_ms_total INTEGER NOT NULL DEFAULT 0,
+    print_latency_ms_max INTEGER,
+    PRIMARY KEY (store_id, day)
+);
+CREATE TABLE IF NOT EXISTS stats_hourly (
+    store_id TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    day TEXT NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    photos_count INTEGER NOT NULL DEFAULT 0,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    printed_count INTEGER NOT NULL DEFAULT 0,
+    print_latency_ms_total INTEGER NOT NULL DEFAULT 0,
+    print_latency_ms_max INTEGER,
+    PRIMARY KEY (store_id, hour)
+);
+CREATE INDEX IF NOT EXISTS stats_hourly_day ON stats_hourly (store_id, day)
+"""
+
+# version 0 tables had no store_id: (table, copied columns, whether rows carry a JSON doc)
+_SQLITE_V0_TABLES = [
+    ("sessions", "session_id, expires_at", True),
+    ("photos", "photo_id, session_id, created_at, purge_at", True),
+    ("orders", "order_number, session_id, status, created_at", True),
+    (
+        "stats_daily",
+        "day, orders_count, photos_count, revenue_cents, printed_count, print_latency_ms_total, print_latency_ms_max",
+        False,
+    ),
+    (
+        "stats_hourly",
+        "hour, day, orders_count, photos_count, revenue_cents, printed_count, print_latency_ms_total, "
+        "print_latency_ms_max",
+        False,
+    ),
+]
+_SQLITE_V0_INDEXES = [
+    "sessions_expires_at",
+    "photos_session",
+    "photos_purge_at",
+    "orders_created",
+    "orders_status",
+    "orders_session",
+    "stats_hourly_day",
+]
+
+
+class SQLiteRepository(Repository):
+    """Embedded single-file store for one-box deployments.
+
+    One connection in WAL mode, used from a dedicated thread so calls are
+    serialized without blocking the event loop. Expiry that Mongo handles
+    with TTL indexes is done by `purge_expired`. Files created before
+    stores existed are migrated on startup, their rows assigned to
+    `legacy_store_id`.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, session_ttl_grace: timedelta, legacy_store_id: str = "main"):
+        self.path = path
+        self.session_ttl_grace = session_ttl_grace
+        self.legacy_store_id = legacy_store_id
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate_v0(self, conn: sqlite3.Connection) -> None:
+        store = self.legacy_store_id
+        for table, _, _ in _SQLITE_V0_TABLES:
+            conn.execute(f"ALTER TABLE {table} RENAME TO v0_{table}")
+        conn.execute("ALTER TABLE settings RENAME TO v0_settings")
+        for index in _SQLITE_V0_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        for statement in _SQLITE_SCHEMA.split(";"):
+            conn.execute(statement)
+        conn.execute(
+            "INSERT INTO settings (store_id, doc) "
+            "SELECT ?, json_remove(json_set(doc, '$.store_id', ?), '$.key') FROM v0_settings WHERE key = 'global'",
+            (store, store),
+        )
+        for table, columns, has_doc in _SQLITE_V0_TABLES:
+            if has_doc:
+                conn.execute(
+                    f"INSERT INTO {table} (store_id, {columns}, doc) "
+                    f"SELECT ?, {columns}, json_set(doc, '$.store_id', ?) FROM v0_{table}",
+                    (store, store),
+                )
+            else:
+                conn.execute(f"INSERT INTO {table} (store_id, {columns}) SELECT ?, {columns} FROM v0_{table}", (store,))
+        for table in ["settings"] + [t for t, _, _ in _SQLITE_V0_TABLES]:
+            conn.execute(f"DROP TABLE v0_{table}")
+        # sequences of today's order numbers continue under the store-scoped name
+        legacy_counters = conn.execute(
+            "SELECT name, seq, purge_at FROM counters WHERE name LIKE 'order_number:%'"
+        ).fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO counters (name, seq, purge_at) VALUES (?, ?, ?)",
+            [(f"order_number:{store}:{r['name'][len('order_number:'):]}", r["seq"], r["purge_at"]) for r in legacy_counters],
+        )
+
+    async def ensure_schema(self) -> None:
+        def ensure(conn):
+            with self._transaction(conn):
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders'").fetchone()
+                if version == 0 and legacy:
+                    self._migrate_v0(conn)
+                else:
+                    for statement in _SQLITE_SCHEMA.split(";"):
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {_SQLITE_SCHEMA_VERSION}")
+
+        await self._run(ensure)
+
+    async def purge_expired(self) -> int:
+        now = datetime.now(timezone.utc)
+
+        def purge(conn):
+            with self._transaction(conn):
+                removed = conn.execute(
+                    "DELETE FROM sessions WHERE expires_at < ?", (_ms(now - self.session_ttl_grace),)
+                ).rowcount
+                removed += conn.execute("DELETE FROM photos WHERE purge_at < ?", (_ms(now),)).rowcount
+                removed += conn.execute("DELETE FROM counters WHERE purge_at < ?", (_ms(now),)).rowcount
+            return removed
+
+        return await self._run(purge)
+
+    async def close(self) -> None:
+        def close(conn):
+            conn.close()
+            self._conn = None
+
+        if self._conn is not None:
+            await self._run(close)
+        self._executor.shutdown(wait=True)
+
+    async def _fetch_doc(self, sql: str, params: tuple) -> Optional[dict]:
+        row = await self._run(lambda conn: conn.execute(sql, params).fetchone())
+        return load_doc(row["doc"]) if row else None
+
+    async def _fetch_docs(self, sql: str, params: Sequence) -> List[dict]:
+        rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        return [load_doc(r["doc"]) for r in rows]
+
+    async def get_settings(self, store_id: str) -> Optional[dict]:
+        return await self._fetch_doc("SELECT doc FROM settings WHERE store_id = ?", (store_id,))
+
+    async def insert_settings(self, doc: dict) -> None:
+        await self._run(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO settings (store_id, doc) VALUES (?, ?)", (doc["store_id"], dump_doc(doc))
+            )
+        )
+
+    async def update_settings(self, store_id: str, fields: dict) -> None:
+        def update(conn):
+            with self._transaction(conn):
+                row = conn.execute("SELECT doc FROM settings WHERE store_id = ?", (store_id,)).fetchone()
+                doc = {**(load_doc(row["doc"]) if row else {"store_id": store_id}), **fields}
+                conn.execute("INSERT OR REPLACE INTO settings (store_id, doc) VALUES (?, ?)", (store_id, dump_doc(doc)))
+
+        await self._run(update)
+
+    async def _write_session(self, verb: str, doc: dict) -> None:
+        await self._run(
+            lambda conn: conn.execute(
+                f"{verb} INTO sessions (store_id, session_id, expires_at, doc) VALUES (?, ?, ?, ?)",
+                (doc["store_id"], doc["session_id"], _ms(doc["expires_at"]), dump_doc(doc)),
+            )
+        )
+
+    async def insert_session(self, doc: dict) -> None:
+        await self._write_session("INSERT", doc)
+
+    async def save_session(self, doc: dict) -> None:
+        await self._write_session("INSERT OR REPLACE", doc)
+
+    async def get_session(self, store_id: str, session_id: str) -> Optional[dict]:
+        return await self._fetch_doc(
+            "SELECT doc FROM sessions WHERE store_id = ? AND session_id = ?", (store_id, session_id)
+        )
+
+    async def _write_photo(self, verb: str, doc: dict) -> None:
+        purge_at = doc.get("purge_at")
+        await self._run(
+            lambda conn: conn.execute(
+                f"{verb} INTO photos (store_id, photo_id, session_id, created_at, purge_at, doc) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    doc["store_id"],
+                    doc["photo_id"],
+                    doc["session_id"],
+                    _ms(doc["created_at"]),
+                    _ms(purge_at) if purge_at else None,
+                    dump_doc(doc),
+                ),
+            )
+        )
+
+    async def insert_photo(self, doc: dict) -> None:
+        await self._write_photo("INSERT", doc)
+
+    async def save_photo(self, doc: dict) -> None:
+        await self._write_photo("INSERT OR REPLACE", doc)
+
+    async def list_session_photos(
+        self, store_id: str, session_id: str, photo_ids: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        sql = "SELECT doc FROM photos WHERE store_id = ? AND session_id = ?"
+        params: list = [store_id, session_id]
+        if photo_ids:
+            sql += f" AND photo_id IN ({','.join('?' * len(photo_ids))})"
+            params.extend(photo_ids)
+        return await self._fetch_docs(sql + " ORDER BY created_at LIMIT 5000", params)
+
+    async def get_photos(self, store_id: str, photo_ids: Sequence[str]) -> List[dict]:
+        ids = list(photo_ids)
+        docs: List[dict] = []
+        # stay well below SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            docs += await self._fetch_docs(
+                f"SELECT doc FROM photos WHERE store_id = ? AND photo_id IN ({','.join('?' * len(chunk))})",
+                [store_id, *chunk],
+            )
+        return docs
+
+    async def _write_order(self, verb: str, doc: dict) -> None:
+        await self._run(
+            lambda conn: conn.execute(
+                f"{verb} INTO orders (store_id, order_number, session_id, status, created_at, doc) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    doc["store_id"],
+                    doc["order_number"],
+                    doc["session_id"],
+                    doc["status"],
+                    _ms(doc["created_at"]),
+                    dump_doc(doc),
+                ),
+            )
+        )
+
+    async def insert_order(self, doc: dict) -> None:
+        await self._write_order("INSERT", doc)
+
+    async def save_order(self, doc: dict) -> None:
+        await self._write_order("INSERT OR REPLACE", doc)
+
+    async def get_order(self, store_id: str, order_number: str) -> Optional[dict]:
+        return await self._fetch_doc(
+            "SELECT doc FROM orders WHERE store_id = ? AND order_number = ?", (store_id, order_number)
+        )
+
+    async def get_orders(self, store_id: str, order_numbers: Sequence[str]) -> List[dict]:
+        numbers = list(order_numbers)
+        docs: List[dict] = []
+        for i in range(0, len(numbers), 500):
+            chunk = numbers[i : i + 500]
+            docs += await self._fetch_docs(
+                f"SELECT doc FROM orders WHERE store_id = ? AND order_number IN ({','.join('?' * len(chunk))})",
+                [store_id, *chunk],
+            )
+        return docs
+
+    async def transition_orders(
+        self, store_id: str, order_numbers: Sequence[str], from_statuses: Sequence[str], status: str, fields: dict
+    ) -> tuple[List[dict], set]:
+        numbers = list(order_numbers)
+
+        def transition(conn):
+            docs, changed = [], set()
+            with self._transaction(conn):
+                for i in range(0, len(numbers), 500):
+                    chunk = numbers[i : i + 500]
+                    rows = conn.execute(
+                        f"SELECT doc FROM orders WHERE store_id = ? AND order_number IN ({','.join('?' * len(chunk))})",
+                        [store_id, *chunk],
+                    ).fetchall()
+                    for row in rows:
+                        doc = load_doc(row["doc"])
+                        if doc["status"] in from_statuses:
+                            doc = {**doc, **fields, "status": status}
+                            conn.execute(
+                                "UPDATE orders SET status = ?, doc = ? WHERE store_id = ? AND order_number = ?",
+                                (status, dump_doc(doc), store_id, doc["order_number"]),
+                            )
+                            changed.add(doc["order_number"])
+                        docs.append(doc)
+            return docs, changed
+
+        return await self._run(transition)
+
+    async def mark_order_printed(self, store_id: str, order_number: str, printed_at: datetime) -> Optional[dict]:
+        def mark(conn):
+            with self._transaction(conn):
+                row = conn.execute(
+                    "SELECT doc FROM orders WHERE store_id = ? AND order_number = ?", (store_id, order_number)
+                ).fetchone()
+                if not row:
+                    return None
+                before = load_doc(row["doc"])
+                if before["status"] == "cancelled":
+                    return before
+                after = {**before, "status": "printed", "printed_at": printed_at}
+                conn.execute(
+                    "UPDATE orders SET status = ?, doc = ? WHERE store_id = ? AND order_number = ?",
+                    ("printed", dump_doc(after), store_id, order_number),
+                )
+            return before
+
+        return await self._run(mark)
+
+    async def list_orders(
+        self,
+        store_id: str,
+        *,
+        status: Optional[str] = None,
+        session_id: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        after: Optional[tuple[datetime, str]] = None,
+        ascending: bool = False,
+        limit: int = 50,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        where, params = ["store_id = ?"], [store_id]
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if session_id:
+            where.append("session_id = ?")
+            params.append(session_id)
+        if created_from:
+            where.append("created_at >= ?")
+            params.append(_ms(created_from))
+        if created_before:
+            where.append("created_at < ?")
+            params.append(_ms(created_before))
+        if after:
+            op = ">" if ascending else "<"
+            where.append(f"(created_at {op} ? OR (created_at = ? AND order_number {op} ?))")
+            params += [_ms(after[0]), _ms(after[0]), after[1]]
+        direction = "ASC" if ascending else "DESC"
+        sql = "SELECT doc FROM orders WHERE " + " AND ".join(where)
+        sql += f" ORDER BY created_at {direction}, order_number {direction} LIMIT ?"
+        docs = await self._fetch_docs(sql, params + [limit])
+        if fields:
+            keep = set(fields)
+            docs = [{k: v for k, v in d.items() if k in keep} for d in docs]
+        return docs
+
+    async def reserve_sequence(self, name: str, count: int, purge_at: datetime) -> int:
+        def reserve(conn):
+            with self._transaction(conn):
+                conn.execute(
+                    "INSERT INTO counters (name, seq, purge_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET seq = seq + excluded.seq",
+                    (name, count, _ms(purge_at)),
+                )
+                return conn.execute("SELECT seq FROM counters WHERE name = ?", (name,)).fetchone()["seq"]
+
+        return await self._run(reserve)
+
+    async def bump_rollups(
+        self, store_id: str, day: str, hour: str, inc: dict, maximums: Optional[dict] = None
+    ) -> None:
+        maximums = maximums or {}
+        unknown = set(inc).difference(ROLLUP_COUNTERS) | set(maximums).difference(ROLLUP_MAXIMUMS)
+        if unknown:
+            raise ValueError(f"unknown rollup fields: {sorted(unknown)}")
+        columns = list(inc) + list(maximums)
+        values = [int(inc[c]) for c in inc] + [int(maximums[c]) for c in maximums]
+        updates = [f"{c} = {c} + excluded.{c}" for c in inc]
+        updates += [f"{c} = MAX(COALESCE({c}, excluded.{c}), excluded.{c})" for c in maximums]
+        placeholders = ", ".join("?" * len(values))
+
+        def bump(conn):
+            with self._transaction(conn):
+                conn.execute(
+                    f"INSERT INTO stats_daily (store_id, day, {', '.join(columns)}) VALUES (?, ?, {placeholders}) "
+                    f"ON CONFLICT (store_id, day) DO UPDATE SET {', '.join(updates)}",
+                    [store_id, day, *values],
+                )
+                conn.execute(
+                    f"INSERT INTO stats_hourly (store_id, hour, day, {', '.join(columns)}) "
+                    f"VALUES (?, ?, ?, {placeholders}) "
+                    f"ON CONFLICT (store_id, hour) DO UPDATE SET {', '.join(updates)}",
+                    [store_id, hour, day, *values],
+                )
+
+        await self._run(bump)
+
+    async def get_rollups(self, store_id: str, granularity: str, day_from: str, day_to: str) -> List[dict]:
+        table, key = ("stats_daily", "day") if granularity == "day" else ("stats_hourly", "hour")
+        rows = await self._run(
+            lambda conn: conn.execute(
+                f"SELECT * FROM {table} WHERE store_id = ? AND day BETWEEN ? AND ? ORDER BY {key}",
+                (store_id, day_from, day_to),
+            ).fetchall()
+        )
+        return [{k: r[k] for k in r.keys() if r[k] is not None} for r in rows]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """Token bucket per client: `per_minute` sustained, bursts up to `burst`."""
+
+    name: str
+    per_minute: float
+    burst: int
+    # rejected with 503 while the event loop is lagging
+    sheddable: bool = True
+
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by (policy, client), LRU-bounded."""
+
+    def __init__(self, max_buckets: int = 10000):
+        self.max_buckets = max_buckets
+        # (policy name, client) -> (tokens, last refill)
+        self._buckets: OrderedDict = OrderedDict()
+        self.limited: dict = {}
+
+    def acquire(self, policy: RatePolicy, client: str) -> float:
+        """Take one token; returns 0 when allowed, else seconds until a token is available."""
+        key = (policy.name, client)
+        now = time.monotonic()
+        rate = policy.per_minute / 60.0
+        tokens, last = self._buckets.get(key, (float(policy.burst), now))
+        tokens = min(float(policy.burst), tokens + (now - last) * rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1 - tokens) / rate if rate > 0 else 60.0
+            self.limited[policy.name] = self.limited.get(policy.name, 0) + 1
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "limited": dict(self.limited)}
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag by how late a periodic sleep wakes up.
+
+    `overloaded` turns on when the smoothed lag crosses `threshold_ms` and
+    off again below half of it, so shedding does not flap.
+    """
+
+    def __init__(self, threshold_ms: float, interval: float = 0.25, smoothing: float = 0.3):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.overloaded = False
+        self.shed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, (time.monotonic() - started - self.interval) * 1000)
+            self.lag_ms += self.smoothing * (lag - self.lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            if self.lag_ms > self.threshold_ms:
+                self.overloaded = True
+            elif self.lag_ms < self.threshold_ms / 2:
+                self.overloaded = False
+
+    def start(self) -> None:
+        if self.threshold_ms > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "lag_ms": round(self.lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "threshold_ms": self.threshold_ms,
+            "overloaded": self.overloaded,
+            "shed": self.shed,
+        }
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger("photo_kiosk")
+
+# taken when the app module is imported, i.e. roughly when the worker starts
+PROCESS_STARTED = time.monotonic()
+
+
+class WarmUp:
+    """Runs startup warm-up steps in the background and tracks readiness.
+
+    Each step runs once; if one fails the remaining ones are retried after
+    `retry_seconds`, so a worker that starts before its database comes
+    back keeps reporting not-ready instead of exiting.
+    """
+
+    def __init__(self, retry_seconds: float = 5.0):
+        self.retry_seconds = retry_seconds
+        self.ready = False
+        self.steps: dict = {}
+        self.startup_ms: Optional[float] = None
+        self.first_request: Optional[dict] = None
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+
+    async def run(self, steps: List[Tuple[str, Callable[[], Awaitable]]]) -> None:
+        while True:
+            self.attempts += 1
+            try:
+                for name, step in steps:
+                    if name in self.steps:
+                        continue
+                    started = time.perf_counter()
+                    await step()
+                    self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+                break
+            except Exception as exc:
+                self.last_error = repr(exc)
+                logger.warning("warm-up failed, retrying in %ss: %s", self.retry_seconds, exc)
+                await asyncio.sleep(self.retry_seconds)
+        self.startup_ms = round((time.monotonic() - PROCESS_STARTED) * 1000, 1)
+        self.ready = True
+        logger.info("warm-up finished, ready after %.0f ms (%s)", self.startup_ms, self.steps)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "startup_ms": self.startup_ms,
+            "steps_ms": dict(self.steps),
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "first_request": self.first_request,
+        }
+
+
+class FirstRequestTimer:
+    """ASGI middleware timing the first request served, then stepping aside."""
+
+    def __init__(self, app, warmup: WarmUp, skip: Tuple[str, ...] = ()):
+        self.app = app
+        self.warmup = warmup
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if self.warmup.first_request is not None or scope["type"] != "http" or scope["path"] in self.skip:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        ready = self.warmup.ready
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.warmup.first_request is None:
+                self.warmup.first_request = {
+                    "method": scope.get("method", ""),
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "after_warm_up": ready,
+                }
@@ -81,6 +81,18 @@ class PhotoKioskAPITester:
         )
         return success
 
+    def test_ready_endpoint(self):
+        """Test readiness endpoint reports a warmed-up worker"""
+        success, response = self.run_test(
+            "API Ready",
+            "GET",
+            "ready",
+            200
+        )
+        if success and response:
+            print(f"   Startup: {response.get('startup_ms')} ms, steps: {response.get('steps_ms')}")
+        return success
+
     def test_settings_get(self):
         """Test get settings"""
         success, response = self.run_test(
@@ -123,6 +135,17 @@ class PhotoKioskAPITester:
             print("   Settings updated successfully")
         return success
 
+    def test_settings_invalid_timezone(self):
+        """Test that an unknown timezone is rejected"""
+        success, _ = self.run_test(
+            "Reject Invalid Timezone",
+            "PUT",
+            "settings",
+            400,
+            data={"timezone": "Mars/Olympus_Mons"}
+        )
+        return success
+
     def test_create_session(self):
         """Test session creation"""
         success, response = self.run_test(
@@ -259,6 +282,9 @@ class PhotoKioskAPITester:
                 print(f"   Status: {response.status_code} ✅")
                 print(f"   Content-Type: {response.headers.get('content-type', 'unknown')}")
                 print(f"   Content-Length: {len(response.content)} bytes")
+                cache_control = response.headers.get('cache-control', '')
+                if 'immutable' not in cache_control or 'private' not in cache_control:
+                    return self.log_test("Get Upload File", False, f"Unexpected Cache-Control: {cache_control}")
                 return self.log_test("Get Upload File", True)
             else:
                 print(f"   Status: {response.status_code} ❌")
@@ -309,6 +335,7 @@ class PhotoKioskAPITester:
         if success and response:
             print(f"   Order Status: {response.get('status')}")
             print(f"   Photos in Order: {len(response.get('photos', []))}")
+            print(f"   Print Prefetch: {response.get('prefetch_status')}")
             
         return success
 
@@ -333,6 +360,181 @@ class PhotoKioskAPITester:
                 
         return success
 
+    def test_list_orders(self):
+        """Test order listing with filters and keyset pagination"""
+        success, response = self.run_test(
+            "List Pending Orders",
+            "GET",
+            "orders?status=pending_print&order=asc&limit=2",
+            200
+        )
+
+        if success and response:
+            orders = response.get('orders', [])
+            if any('photos' in o for o in orders):
+                return self.log_test("Order List Projection", False, "Photos included in order list")
+            if any(o.get('status') != 'pending_print' for o in orders):
+                return self.log_test("Order List Filter", False, "Status filter not applied")
+            print(f"   Page size: {len(orders)} - next cursor: {response.get('next_cursor')}")
+
+            if response.get('next_cursor'):
+                success2, page2 = self.run_test(
+                    "List Pending Orders (Next Page)",
+                    "GET",
+                    f"orders?status=pending_print&order=asc&limit=2&cursor={response['next_cursor']}",
+                    200
+                )
+                first = {o['order_number'] for o in orders}
+                if success2 and any(o['order_number'] in first for o in page2.get('orders', [])):
+                    return self.log_test("Order List Pagination", False, "Pages overlap")
+
+        if success and self.session_id:
+            success, response = self.run_test(
+                "List Session Orders",
+                "GET",
+                f"orders?session_id={self.session_id}",
+                200
+            )
+            if success and self.order_number not in [o['order_number'] for o in response.get('orders', [])]:
+                return self.log_test("Order List Session Filter", False, "Created order not listed")
+
+        return success
+
+    def test_bulk_orders(self):
+        """Test bulk order fetch and bulk mark-printed"""
+        if not self.order_number:
+            return self.log_test("Bulk Orders", False, "No order_number available")
+
+        numbers = [self.order_number, "APF-000000-0000"]
+        success, response = self.run_test(
+            "Bulk Get Orders",
+            "POST",
+            "orders/bulk/get",
+            200,
+            data={"order_numbers": numbers}
+        )
+        if success and response:
+            if [o.get('order_number') for o in response.get('orders', [])] != [self.order_number]:
+                return self.log_test("Bulk Get Check", False, "Unexpected orders returned")
+            if response.get('not_found') != ["APF-000000-0000"]:
+                return self.log_test("Bulk Get Check", False, "Unknown order not reported")
+
+        success2, response2 = self.run_test(
+            "Bulk Mark Orders Printed",
+            "POST",
+            "orders/bulk/mark-printed",
+            200,
+            data={"order_numbers": [self.order_number]}
+        )
+        if success2 and response2:
+            statuses = [o.get('status') for o in response2.get('orders', [])]
+            if statuses != ['printed']:
+                return self.log_test("Bulk Mark Printed Check", False, f"Unexpected statuses {statuses}")
+            print(f"   Changed: {response2.get('changed')}")
+
+        return success and success2
+
+    def test_cancelled_order_cannot_be_printed(self):
+        """Test a cancelled order is not brought back by mark-printed"""
+        if not self.session_id:
+            return self.log_test("Cancelled Order Print", False, "No session_id available")
+
+        success, order = self.run_test(
+            "Create Order To Cancel",
+            "POST",
+            f"sessions/{self.session_id}/orders",
+            200,
+            data={"selected_photo_ids": None}
+        )
+        if not success or not order:
+            return False
+        number = order.get('order_number')
+
+        success2, _ = self.run_test(
+            "Bulk Cancel Orders",
+            "POST",
+            "orders/bulk/cancel",
+            200,
+            data={"order_numbers": [number]}
+        )
+        success3, _ = self.run_test(
+            "Mark Cancelled Order Printed",
+            "POST",
+            f"orders/{number}/mark-printed",
+            409
+        )
+        return success2 and success3
+
+    def test_admin_stats(self):
+        """Test sales rollups reflect the created and printed order"""
+        success, response = self.run_test(
+            "Admin Stats",
+            "GET",
+            "admin/stats",
+            200
+        )
+
+        if success and response:
+            totals = response.get('totals', {})
+            if self.order_number and totals.get('orders_count', 0) < 1:
+                return self.log_test("Stats Totals Check", False, "Created order not counted in rollups")
+            if self.order_number and totals.get('printed_count', 0) < 1:
+                return self.log_test("Stats Totals Check", False, "Printed order not counted in rollups")
+            print(f"   Orders: {totals.get('orders_count')} - Revenue: {totals.get('revenue')}")
+            print(f"   Buckets: {len(response.get('buckets', []))}")
+
+        success2, _ = self.run_test(
+            "Admin Stats (Invalid Date)",
+            "GET",
+            "admin/stats?date_from=not-a-date",
+            400
+        )
+
+        return success and success2
+
+    def test_admin_diagnostics(self):
+        """Test diagnostics expose session cache counters"""
+        success, response = self.run_test(
+            "Admin Diagnostics",
+            "GET",
+            "admin/diagnostics",
+            200
+        )
+
+        if success and response:
+            cache = response.get('session_cache', {})
+            missing = [f for f in ['entries', 'hits', 'misses', 'hit_ratio'] if f not in cache]
+            if missing:
+                return self.log_test("Session Cache Stats Check", False, f"Missing fields: {missing}")
+            print(f"   Session cache hit ratio: {cache.get('hit_ratio')}")
+            if 'print_prefetch' not in response:
+                return self.log_test("Print Prefetch Stats Check", False, "Missing print_prefetch")
+
+        return success
+
+    def test_admin_profiling(self):
+        """Test profiler status and captured profiles are exposed"""
+        success, response = self.run_test(
+            "Admin Profiling Status",
+            "GET",
+            "admin/profiling",
+            200
+        )
+
+        if success and response:
+            missing = [f for f in ['enabled', 'sample_rate', 'slow_ms', 'profiles'] if f not in response]
+            if missing:
+                return self.log_test("Profiling Status Check", False, f"Missing fields: {missing}")
+            print(f"   Profiling enabled: {response.get('enabled')}, captured: {response.get('profiles')}")
+
+        listed, _ = self.run_test(
+            "Admin Profiles List",
+            "GET",
+            "admin/profiles",
+            200
+        )
+        return success and listed
+
     def test_admin_pin_verification(self):
         """Test admin PIN verification endpoint"""
         # Test correct PIN (default 1234)
@@ -393,10 +595,12 @@ class PhotoKioskAPITester:
         # Test sequence
         tests = [
             self.test_root_endpoint,
+            self.test_ready_endpoint,
             self.test_settings_get,
             self.test_settings_security,
             self.test_admin_pin_verification,
             self.test_settings_update,
+            self.test_settings_invalid_timezone,
             self.test_create_session,
             self.test_get_session,
             self.test_upload_photos,
@@ -404,7 +608,13 @@ class PhotoKioskAPITester:
             self.test_get_upload_file,
             self.test_create_order,
             self.test_get_order,
+            self.test_list_orders,
             self.test_mark_order_printed,
+            self.test_bulk_orders,
+            self.test_cancelled_order_cannot_be_printed,
+            self.test_admin_stats,
+            self.test_admin_diagnostics,
+            self.test_admin_profiling,
         ]
         
         for test in tests:
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Rebuild the sales rollups for days before they were kept.
+
+The API only counts orders into stats_daily/stats_hourly from the moment
+rollups were deployed, so /api/admin/stats shows nothing for earlier days.
+This recomputes those days from the orders collection, per store and in
+the store's timezone (its settings, else STORE_TIMEZONE):
+
+- orders, photos and revenue in the hour the order was created, leaving
+  out cancelled orders
+- prints and print latency in the hour the order was printed
+
+Only days before --before are written; they are overwritten with `$set`
+and record that cutoff in `backfilled_before`. By default --before is the
+day after the store's first rollup (the deploy day was only partly
+counted), but never later than today, whose counters the API is still
+bumping. A re-run reuses the recorded cutoff, so it rewrites the same days
+and never the ones counted live. Orders are read in small batches, so it is safe to run
+while the API serves traffic.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Load environment
+ROOT_DIR = Path(__file__).parent / "backend"
+load_dotenv(ROOT_DIR / ".env")
+sys.path.insert(0, str(ROOT_DIR))
+
+from storage import ROLLUP_COUNTERS, as_datetime  # noqa: E402
+
+mongo_url = os.environ["MONGO_URL"]
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ["DB_NAME"]]
+
+DEFAULT_TIMEZONE = os.environ.get("STORE_TIMEZONE") or os.environ.get("STATS_TIMEZONE", "UTC")
+
+FIELDS = {"created_at": 1, "printed_at": 1, "status": 1, "photo_count": 1, "photo_ids": 1, "total_amount": 1}
+
+
+async def store_zone(store_id: str) -> ZoneInfo:
+    settings = await db.settings.find_one({"store_id": store_id}, {"timezone": 1}) or {}
+    return ZoneInfo(settings.get("timezone") or DEFAULT_TIMEZONE)
+
+
+async def cutoff_day(store_id: str, tz: ZoneInfo) -> date:
+    today = datetime.now(tz).date()
+    # an earlier run already chose the cutoff; once it has written, the first rollup is
+    # a backfilled one and no longer marks the deploy day
+    previous = await db.stats_daily.find_one(
+        {"store_id": store_id, "backfilled_before": {"$exists": True}},
+        {"backfilled_before": 1},
+        sort=[("backfilled_before", -1)],
+    )
+    if previous is not None:
+        return date.fromisoformat(previous["backfilled_before"])
+    first = await db.stats_daily.find_one({"store_id": store_id}, {"day": 1}, sort=[("day", 1)])
+    if first is None:
+        return today
+    return min(date.fromisoformat(first["day"]) + timedelta(days=1), today)
+
+
+async def compute(store_id: str, tz: ZoneInfo, before: datetime, batch_size: int, pause: float):
+    """Day and hour rollups of the store's orders, limited to hours before `before`."""
+    days = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+    hours = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+
+    def add(moment: datetime, inc: dict, latency: Optional[int] = None) -> None:
+        local = moment.astimezone(tz)
+        for bucket in (days[local.strftime("%Y-%m-%d")], hours[local.strftime("%Y-%m-%dT%H")]):
+            for field, value in inc.items():
+                bucket[field] += value
+            if latency is not None:
+                bucket["print_latency_ms_max"] = max(bucket.get("print_latency_ms_max", 0), latency)
+
+    query = {"store_id": store_id, "$or": [{"created_at": {"$lt": before}}, {"printed_at": {"$lt": before}}]}
+    last_id = None
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await db.orders.find(query, FIELDS).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        for order in docs:
+            created = as_datetime(order["created_at"])
+            if created < before and order.get("status") != "cancelled":
+                add(created, {
+                    "orders_count": 1,
+                    "photos_count": int(order.get("photo_count", len(order.get("photo_ids", [])))),
+                    "revenue_cents": int(round(float(order.get("total_amount", 0)) * 100)),
+                })
+            printed = order.get("printed_at")
+            if printed is not None and as_datetime(printed) < before:
+                latency = max(0, int((as_datetime(printed) - created).total_seconds() * 1000))
+                add(as_datetime(printed), {"printed_count": 1, "print_latency_ms_total": latency}, latency)
+        await asyncio.sleep(pause)
+    return days, hours
+
+
+async def write(
+    collection, key: str, store_id: str, buckets: dict, cutoff: date, batch_size: int, pause: float
+) -> int:
+    ops = []
+    written = 0
+    for period, counters in sorted(buckets.items()):
+        fields = {**counters, "backfilled_before": cutoff.isoformat()}
+        if key == "hour":
+            fields["day"] = period[:10]
+        ops.append(UpdateOne({"store_id": store_id, key: period}, {"$set": fields}, upsert=True))
+        if len(ops) >= batch_size:
+            await collection.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+            await asyncio.sleep(pause)
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        written += len(ops)
+    return written
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--store-id", action="append", help="only these stores (default: every store with orders)")
+    parser.add_argument("--before", type=date.fromisoformat, help="first day to leave alone, AAAA-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    try:
+        for store_id in args.store_id or sorted(await db.orders.distinct("store_id")):
+            tz = await store_zone(store_id)
+            day = args.before or await cutoff_day(store_id, tz)
+            before = datetime.combine(day, time.min, tzinfo=tz).astimezone(timezone.utc)
+            days, hours = await compute(store_id, tz, before, args.batch_size, args.pause)
+            await write(db.stats_daily, "day", store_id, days, day, args.batch_size, args.pause)
+            await write(db.stats_hourly, "hour", store_id, hours, day, args.batch_size, args.pause)
+            print(f"✅ {store_id}: {len(days)} days / {len(hours)} hours rebuilt before {day} ({tz.key})")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
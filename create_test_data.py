@@ -5,7 +5,7 @@ Create test data for receipt testing
 import asyncio
 import os
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
@@ -17,9 +17,10 @@ load_dotenv(ROOT_DIR / ".env")
 mongo_url = os.environ["MONGO_URL"]
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ["DB_NAME"]]
+STORE_ID = os.environ.get("DEFAULT_STORE_ID", "main")
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
 
 def _order_number() -> str:
     stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
@@ -30,13 +31,14 @@ async def create_test_data():
     
     # Create test session
     session_id = "test-session-receipt-" + uuid.uuid4().hex[:8]
-    created_at = _now_iso()
+    created_at = _now()
     
     session_doc = {
+        "store_id": STORE_ID,
         "session_id": session_id,
         "status": "active",
         "created_at": created_at,
-        "expires_at": created_at,  # Won't expire during test
+        "expires_at": created_at + timedelta(hours=2),
     }
     await db.sessions.insert_one(session_doc)
     print(f"✅ Created test session: {session_id}")
@@ -46,6 +48,7 @@ async def create_test_data():
     for i in range(3):  # Create 3 test photos
         photo_id = uuid.uuid4().hex
         photo_doc = {
+            "store_id": STORE_ID,
             "photo_id": photo_id,
             "session_id": session_id,
             "file_key": f"test-photo-{i+1}.jpg",
@@ -60,7 +63,7 @@ async def create_test_data():
         print(f"✅ Created test photo: {photo_doc['file_name']}")
     
     # Get settings for order creation
-    settings = await db.settings.find_one({"key": "global"}, {"_id": 0})
+    settings = await db.settings.find_one({"store_id": STORE_ID}, {"_id": 0})
     if not settings:
         settings = {
             "store_name": "Amor por Fotos",
@@ -75,6 +78,7 @@ async def create_test_data():
     total = round(price * len(test_photos), 2)
     
     order_doc = {
+        "store_id": STORE_ID,
         "order_number": order_number,
         "session_id": session_id,
         "photo_ids": [p["photo_id"] for p in test_photos],
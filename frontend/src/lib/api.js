@@ -3,13 +3,47 @@ import axios from "axios";
 export const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 export const API_BASE = `${BACKEND_URL}/api`;
 
+// Kiosks are provisioned once by opening any page with ?store=<id>; the
+// phone upload link carries the store the same way.
+const STORE_KEY = "storeId";
+const storeParam = new URLSearchParams(window.location.search).get("store");
+if (storeParam) window.localStorage.setItem(STORE_KEY, storeParam);
+
+export const getStoreId = () =>
+  storeParam || window.localStorage.getItem(STORE_KEY) || process.env.REACT_APP_STORE_ID || "";
+
 export const api = axios.create({
   baseURL: API_BASE,
   timeout: 600000,
 });
 
+api.interceptors.request.use((config) => {
+  const storeId = getStoreId();
+  if (storeId) config.headers["X-Store-Id"] = storeId;
+  return config;
+});
+
 export const absoluteFromPath = (path) => {
   if (!path) return "";
   if (path.startsWith("http")) return path;
   return `${BACKEND_URL}${path}`;
 };
+
+// Resolves once every image has loaded or failed (or after timeoutMs), so
+// auto-print never fires before the photos are on the page. Uploads are
+// served as immutable, so the <img> tags then reuse the same bytes.
+export const preloadImages = (paths, timeoutMs = 10000) => {
+  const loads = paths.map(
+    (path) =>
+      new Promise((resolve) => {
+        const img = new Image();
+        img.onload = resolve;
+        img.onerror = resolve;
+        img.src = absoluteFromPath(path);
+      })
+  );
+  return Promise.race([
+    Promise.all(loads),
+    new Promise((resolve) => setTimeout(resolve, timeoutMs)),
+  ]);
+};
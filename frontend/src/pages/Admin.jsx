@@ -27,6 +27,7 @@ export default function Admin() {
   const [currency, setCurrency] = useState("BRL");
   const [pricePerPhoto, setPricePerPhoto] = useState("2.50");
   const [receiptFooter, setReceiptFooter] = useState("");
+  const [timezone, setTimezone] = useState("");
   const [newPin, setNewPin] = useState("");
 
   const currencyLabel = useMemo(() => {
@@ -44,6 +45,7 @@ export default function Admin() {
       setCurrency(data.currency || "BRL");
       setPricePerPhoto(String(data.price_per_photo ?? 2.5));
       setReceiptFooter(data.receipt_footer || "");
+      setTimezone(data.timezone || "");
     } catch (e) {
       toast.error("Não foi possível carregar os ajustes.");
     } finally {
@@ -84,13 +86,14 @@ export default function Admin() {
         price_per_photo: p,
         receipt_footer: receiptFooter,
       };
+      if (timezone.trim()) payload.timezone = timezone.trim();
       if (newPin.trim()) payload.admin_pin = newPin.trim();
 
       await api.put("/settings", payload);
       toast.success("Salvo.");
       navigate("/");
     } catch (e) {
-      toast.error("Falha ao salvar.");
+      toast.error(e?.response?.data?.detail || "Falha ao salvar.");
     } finally {
       setSaving(false);
     }
@@ -236,6 +239,18 @@ export default function Admin() {
                     />
                   </div>
 
+                  <div className="space-y-2">
+                    <Label htmlFor="timezone" data-testid="admin-timezone-label">Fuso horário</Label>
+                    <Input
+                      id="timezone"
+                      value={timezone}
+                      onChange={(e) => setTimezone(e.target.value)}
+                      className="h-11 rounded-xl"
+                      placeholder="America/Sao_Paulo"
+                      data-testid="admin-timezone-input"
+                    />
+                  </div>
+
                   <div className="space-y-2">
                     <Label htmlFor="newPin" data-testid="admin-new-pin-label">Trocar PIN</Label>
                     <Input
@@ -7,7 +7,7 @@ import { CheckCircle2, Clock3, Printer, RotateCcw } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent } from "@/components/ui/card";
 import { toast } from "@/components/ui/sonner";
-import { api } from "@/lib/api";
+import { api, getStoreId } from "@/lib/api";
 
 const LOGO_URL =
   "https://customer-assets.emergentagent.com/job_photo-kiosk-5/artifacts/em2ts921_1753098819.amorporfotos.com.br-removebg-preview.png";
@@ -22,7 +22,8 @@ export default function KioskSession() {
 
   const uploadUrl = useMemo(() => {
     const origin = window.location.origin;
-    return origin + "/upload/" + sessionId;
+    const storeId = getStoreId();
+    return origin + "/upload/" + sessionId + (storeId ? "?store=" + encodeURIComponent(storeId) : "");
   }, [sessionId]);
 
   const kioskAutoReturnSec = 5 * 60;
@@ -7,7 +7,7 @@ import { QRCodeSVG } from "qrcode.react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent } from "@/components/ui/card";
 import { toast } from "@/components/ui/sonner";
-import { absoluteFromPath, api } from "@/lib/api";
+import { absoluteFromPath, api, preloadImages } from "@/lib/api";
 
 const LOGO_URL =
   "https://customer-assets.emergentagent.com/job_photo-kiosk-5/artifacts/em2ts921_1753098819.amorporfotos.com.br-removebg-preview.png";
@@ -68,13 +68,16 @@ export default function PrintOrder() {
 
   useEffect(() => {
     if (!order || !autoPrint) return;
-    const t = setTimeout(() => {
+    let cancelled = false;
+    const rendered = new Promise((resolve) => setTimeout(resolve, 700));
+    Promise.all([rendered, preloadImages(photos.map((p) => p.url_path))]).then(() => {
+      if (cancelled) return;
       try {
         window.print();
       } catch (e) {
         // ignore
       }
-    }, 700);
+    });
 
     const after = async () => {
       try {
@@ -86,7 +89,7 @@ export default function PrintOrder() {
 
     window.addEventListener("afterprint", after);
     return () => {
-      clearTimeout(t);
+      cancelled = true;
       window.removeEventListener("afterprint", after);
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -5,7 +5,7 @@ import { RotateCcw } from "lucide-react";
 
 import { Button } from "@/components/ui/button";
 import { toast } from "@/components/ui/sonner";
-import { absoluteFromPath, api } from "@/lib/api";
+import { absoluteFromPath, api, preloadImages } from "@/lib/api";
 
 const LOGO_URL =
   "https://customer-assets.emergentagent.com/job_photo-kiosk-5/artifacts/em2ts921_1753098819.amorporfotos.com.br-removebg-preview.png";
@@ -43,15 +43,20 @@ export default function PrintPhotos() {
 
   useEffect(() => {
     if (!order || !autoPrint) return;
-    const t = setTimeout(() => {
+    let cancelled = false;
+    const rendered = new Promise((resolve) => setTimeout(resolve, 450));
+    Promise.all([rendered, preloadImages(photos.map((p) => p.url_path))]).then(() => {
+      if (cancelled) return;
       try {
         window.print();
       } catch (e) {
         // ignore
       }
-    }, 450);
-    return () => clearTimeout(t);
-  }, [order, autoPrint]);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [order, photos, autoPrint]);
 
   if (loading) {
     return (
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Assign data written before multi-store support to one store.
+
+Run it during the cutover, after stopping the old API and before starting
+the multi-store one. It does three things:
+
+- stamps `store_id` on settings, sessions, photos, orders and rollups
+- renames the "global" settings document
+- carries today's order number counters over to their per-store names
+
+The old API must not be running: it would recreate the "global" settings
+with default prices and keep numbering orders from the old counters, so
+new orders would reuse numbers already handed out. The script checks for
+that and exits with an error if the old counters moved or unstamped
+documents are left; stop the old API and run it again.
+
+With --shard, it then shards the collections on the store-prefixed keys.
+Use this only once the new API has started, because its indexes back the
+shard keys.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Load environment
+ROOT_DIR = Path(__file__).parent / "backend"
+load_dotenv(ROOT_DIR / ".env")
+sys.path.insert(0, str(ROOT_DIR))
+
+from storage import SHARD_KEYS  # noqa: E402
+
+mongo_url = os.environ["MONGO_URL"]
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ["DB_NAME"]]
+
+COLLECTIONS = ["sessions", "photos", "orders", "stats_daily", "stats_hourly"]
+
+
+async def backfill(collection, store_id: str, batch_size: int, pause: float) -> int:
+    """Set store_id on documents that have none, returning how many were stamped."""
+    stamped = 0
+    while True:
+        docs = await collection.find({"store_id": {"$exists": False}}, {"_id": 1}).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        result = await collection.update_many(
+            {"_id": {"$in": [d["_id"] for d in docs]}, "store_id": {"$exists": False}},
+            {"$set": {"store_id": store_id}},
+        )
+        stamped += result.modified_count
+        await asyncio.sleep(pause)
+    return stamped
+
+
+async def migrate_settings(store_id: str) -> bool:
+    if await db.settings.find_one({"store_id": store_id}):
+        return False
+    result = await db.settings.update_one(
+        {"key": "global"}, {"$set": {"store_id": store_id}, "$unset": {"key": ""}}
+    )
+    return bool(result.modified_count)
+
+
+async def migrate_counters(store_id: str) -> int:
+    """Copy order_number:<prefix>:<day> counters to order_number:<store>:<prefix>:<day>."""
+    copied = 0
+    async for counter in db.counters.find({"_id": {"$regex": "^order_number:[^:]+:[^:]+$"}}):
+        suffix = counter["_id"][len("order_number:"):]
+        await db.counters.update_one(
+            {"_id": f"order_number:{store_id}:{suffix}"},
+            {"$max": {"seq": counter["seq"]}, "$setOnInsert": {"purge_at": counter.get("purge_at")}},
+            upsert=True,
+        )
+        copied += 1
+    return copied
+
+
+async def legacy_counters() -> dict:
+    return {
+        c["_id"]: c["seq"] async for c in db.counters.find({"_id": {"$regex": "^order_number:[^:]+:[^:]+$"}})
+    }
+
+
+async def leftovers() -> dict:
+    """Collections that still hold documents without store_id."""
+    counts = {name: await db[name].count_documents({"store_id": {"$exists": False}}) for name in COLLECTIONS}
+    return {name: count for name, count in counts.items() if count}
+
+
+async def shard_collections() -> None:
+    await client.admin.command("enableSharding", db.name)
+    for name, key in SHARD_KEYS.items():
+        await client.admin.command("shardCollection", f"{db.name}.{name}", key=key)
+        print(f"✅ {name}: sharded on {key}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--store-id", default=os.environ.get("DEFAULT_STORE_ID", "main"))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--shard", action="store_true", help="also shard the collections on their store keys")
+    args = parser.parse_args()
+
+    try:
+        before = await legacy_counters()
+        if await migrate_settings(args.store_id):
+            print(f"✅ settings: global -> {args.store_id}")
+        for name in COLLECTIONS:
+            count = await backfill(db[name], args.store_id, args.batch_size, args.pause)
+            print(f"✅ {name}: {count} stamped with store_id={args.store_id}")
+        copied = await migrate_counters(args.store_id)
+        print(f"✅ counters: {copied} order number sequences carried over")
+        left = await leftovers()
+        if left or await legacy_counters() != before:
+            print("❌ the old API is still writing; stop it and run this script again")
+            if left:
+                print(f"   documents without store_id: {left}")
+            sys.exit(1)
+        if args.shard:
+            await shard_collections()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Convert ISO-string timestamps to native BSON datetimes.
+
+Safe to run while the API is serving traffic: documents are rewritten in
+small batches, each update only applies if the field still holds the string
+that was read, and the API accepts both representations in the meantime.
+Run it again until it reports nothing left to convert.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Load environment
+ROOT_DIR = Path(__file__).parent / "backend"
+load_dotenv(ROOT_DIR / ".env")
+
+mongo_url = os.environ["MONGO_URL"]
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ["DB_NAME"]]
+
+SESSION_DURATION = timedelta(hours=2)
+PHOTO_RETENTION = timedelta(days=float(os.environ.get("PHOTO_RETENTION_DAYS", "30")))
+
+FIELDS = {
+    "settings": ["updated_at"],
+    "sessions": ["created_at", "expires_at"],
+    "photos": ["created_at"],
+    "orders": ["created_at", "printed_at"],
+}
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+async def convert_field(collection, field: str, batch_size: int, pause: float) -> int:
+    """Rewrite string values of `field` as datetimes, returning how many were converted."""
+    converted = 0
+    unparseable = []
+    while True:
+        query = {field: {"$type": "string"}}
+        if unparseable:
+            query["_id"] = {"$nin": unparseable}
+        docs = await collection.find(query, {field: 1}).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            try:
+                value = _parse(doc[field])
+            except ValueError:
+                unparseable.append(doc["_id"])
+                continue
+            ops.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: value}}))
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            converted += result.modified_count
+        await asyncio.sleep(pause)
+
+    if unparseable:
+        print(f"⚠️  {collection.name}.{field}: {len(unparseable)} unparseable values left as-is")
+    return converted
+
+
+async def backfill_photo_purge(batch_size: int, pause: float) -> int:
+    """Give photos stored before the TTL index a purge_at so they expire too."""
+    filled = 0
+    last_id = None
+    while True:
+        query = {"purge_at": {"$exists": False}, "created_at": {"$type": "date"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await db.photos.find(query, {"created_at": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"], "purge_at": {"$exists": False}},
+                {"$set": {"purge_at": doc["created_at"] + SESSION_DURATION + PHOTO_RETENTION}},
+            )
+            for doc in docs
+        ]
+        result = await db.photos.bulk_write(ops, ordered=False)
+        filled += result.modified_count
+        await asyncio.sleep(pause)
+    return filled
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    try:
+        for name, fields in FIELDS.items():
+            for field in fields:
+                count = await convert_field(db[name], field, args.batch_size, args.pause)
+                print(f"✅ {name}.{field}: {count} converted")
+        filled = await backfill_photo_purge(args.batch_size, args.pause)
+        print(f"✅ photos.purge_at: {filled} backfilled")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
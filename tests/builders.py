@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeClock:
+    """Stand-in for time.monotonic, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def ts(minutes: int = 0) -> datetime:
+    return NOW + timedelta(minutes=minutes)
+
+
+def make_order(number: str, minutes: int = 0, status: str = "pending_print", store_id: str = "main") -> dict:
+    return {
+        "store_id": store_id,
+        "order_number": number,
+        "session_id": "s1",
+        "photo_ids": ["p1"],
+        "photo_count": 1,
+        "status": status,
+        "created_at": ts(minutes),
+        "printed_at": None,
+    }
+
+
+def make_photo(photo_id: str, minutes: int = 0, store_id: str = "main") -> dict:
+    return {
+        "store_id": store_id,
+        "photo_id": photo_id,
+        "session_id": "s1",
+        "file_key": f"{photo_id}.jpg",
+        "created_at": ts(minutes),
+    }
@@ -0,0 +1,19 @@
+import asyncio
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+# the backend is a flat directory of modules, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from storage import SQLiteRepository  # noqa: E402
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "kiosk.db"), session_ttl_grace=timedelta(hours=1))
+    asyncio.run(repo.ensure_schema())
+    yield repo
+    asyncio.run(repo.close())
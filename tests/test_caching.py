@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import caching
+from caching import SessionCache
+from tests.builders import FakeClock
+
+
+def _session(session_id: str, expires_in: timedelta) -> dict:
+    return {"store_id": "main", "session_id": session_id, "expires_at": datetime.now(timezone.utc) + expires_in}
+
+
+def _cache(**overrides) -> SessionCache:
+    options = {"max_entries": 8, "ttl": 30, "negative_ttl": 5, "purge_grace": timedelta(hours=1)}
+    return SessionCache(**{**options, **overrides})
+
+
+def test_hits_and_negative_entries_expire(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(caching.time, "monotonic", clock)
+    cache = _cache()
+    doc = _session("s1", timedelta(hours=2))
+    cache.put(("main", "s1"), doc)
+    cache.put(("main", "missing"), None)
+
+    assert cache.get(("main", "s1")) == (True, doc)
+    assert cache.get(("main", "missing")) == (True, None)
+    assert cache.get(("other", "s1")) == (False, None)
+
+    clock.now += 6
+    assert cache.get(("main", "missing")) == (False, None)
+    assert cache.get(("main", "s1")) == (True, doc)
+    clock.now += 30
+    assert cache.get(("main", "s1")) == (False, None)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (2, 1, 3)
+    assert stats["entries"] == 0
+
+
+def test_entries_never_outlive_the_ttl_index(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(caching.time, "monotonic", clock)
+    cache = _cache(ttl=600)
+
+    # purged by the TTL monitor in 10 seconds: cached for 10 seconds at most
+    cache.put(("main", "s1"), _session("s1", timedelta(hours=-1, seconds=10)))
+    clock.now += 11
+    assert cache.get(("main", "s1")) == (False, None)
+
+    # already past its purge time: not cached at all, and a stale entry is dropped
+    cache.put(("main", "s2"), _session("s2", timedelta(hours=2)))
+    cache.put(("main", "s2"), _session("s2", timedelta(hours=-2)))
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache(max_entries=2)
+    for session_id in ["s1", "s2"]:
+        cache.put(("main", session_id), _session(session_id, timedelta(hours=2)))
+    cache.get(("main", "s1"))
+    cache.put(("main", "s3"), _session("s3", timedelta(hours=2)))
+
+    assert cache.get(("main", "s2")) == (False, None)
+    assert cache.get(("main", "s1"))[0]
+    assert cache.get(("main", "s3"))[0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = _cache(max_entries=0)
+    cache.put(("main", "s1"), _session("s1", timedelta(hours=2)))
+    assert cache.get(("main", "s1")) == (False, None)
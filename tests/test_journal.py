@@ -0,0 +1,202 @@
+import asyncio
+from datetime import timedelta
+
+from journal import JournaledRepository, WriteJournal
+from storage import SQLiteRepository, StoreUnavailable
+from tests.builders import make_order, make_photo, ts
+
+
+def _repos(tmp_path):
+    inner = SQLiteRepository(str(tmp_path / "kiosk.db"), session_ttl_grace=timedelta(hours=1))
+    return inner, JournaledRepository(inner, str(tmp_path / "journal"), retry_seconds=0.05)
+
+
+def test_reads_merge_unflushed_writes_until_replayed(tmp_path):
+    async def scenario():
+        inner, repo = _repos(tmp_path)
+        await repo.ensure_schema()
+        await inner.insert_order(make_order("A-1", 0))
+
+        async def down(doc):
+            raise ConnectionError("store unavailable")
+
+        repo._savers = {"photo": down, "order": down}
+        await repo.insert_photo(make_photo("p1", 0))
+        await repo.insert_order(make_order("A-2", 1))
+        before = await repo.mark_order_printed("main", "A-2", ts(2))
+        await asyncio.sleep(0.1)
+
+        assert before["status"] == "pending_print"
+        assert await inner.get_order("main", "A-2") is None
+        assert (await repo.get_order("main", "A-2"))["status"] == "printed"
+        assert await repo.get_order("other", "A-2") is None
+        assert [p["photo_id"] for p in await repo.list_session_photos("main", "s1")] == ["p1"]
+        listed = await repo.list_orders("main", fields=["order_number", "status"])
+        assert listed == [{"order_number": "A-2", "status": "printed"}, {"order_number": "A-1", "status": "pending_print"}]
+        assert [o["order_number"] for o in await repo.list_orders("main", status="pending_print")] == ["A-1"]
+        assert await repo.list_orders("other") == []
+        assert repo.stats()["pending"] == 2
+
+        repo._savers = {"photo": inner.save_photo, "order": inner.save_order}
+        assert await repo.flush() == 2
+        assert (await inner.get_order("main", "A-2"))["status"] == "printed"
+        assert [p["photo_id"] for p in await inner.get_photos("main", ["p1"])] == ["p1"]
+        # replay is idempotent
+        await inner.save_order(await inner.get_order("main", "A-2"))
+        await repo.close()
+
+    asyncio.run(scenario())
+
+
+def test_orphaned_journal_is_adopted(tmp_path):
+    async def scenario():
+        orphan = WriteJournal(tmp_path / "journal" / "journal-999999.db")
+        await orphan.open()
+        # written before stores existed: no store_id, keyed by the bare order number
+        legacy = make_order("A-9", 0)
+        del legacy["store_id"]
+        await orphan.put("order", "A-9", legacy)
+        # the worker dies without flushing: connection and lock go away, the file stays
+        orphan._conn.close()
+        orphan._lock_file.close()
+        assert (tmp_path / "journal" / "journal-999999.db").exists()
+
+        inner, repo = _repos(tmp_path)
+        await repo.ensure_schema()
+        assert (await repo.get_order("main", "A-9"))["order_number"] == "A-9"
+        await asyncio.sleep(0.1)
+        assert (await inner.get_order("main", "A-9"))["store_id"] == "main"
+        assert not (tmp_path / "journal" / "journal-999999.db").exists()
+        await repo.close()
+
+    asyncio.run(scenario())
+
+
+def test_journal_opens_while_the_store_is_down(tmp_path):
+    async def scenario():
+        inner, repo = _repos(tmp_path)
+
+        async def down():
+            raise ConnectionError("store unavailable")
+
+        inner.ensure_schema = down
+        try:
+            await repo.ensure_schema()
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("ensure_schema should report the store failure")
+
+        await repo.insert_order(make_order("A-1", 0))
+        assert (await repo.get_order("main", "A-1"))["status"] == "pending_print"
+        assert repo.stats()["pending"] == 1
+        # the warm-up retry opens nothing twice
+        del inner.ensure_schema
+        await repo.ensure_schema()
+        await asyncio.sleep(0.1)
+        assert await inner.get_order("main", "A-1") is not None
+        await repo.close()
+
+    asyncio.run(scenario())
+
+
+def test_second_worker_cannot_share_the_journal(tmp_path):
+    async def scenario():
+        _, first = _repos(tmp_path)
+        await first.open()
+        second = JournaledRepository(first.inner, str(tmp_path / "journal"))
+        try:
+            await second.open()
+        except RuntimeError as exc:
+            assert "single worker" in str(exc)
+        else:
+            raise AssertionError("the journal was opened twice")
+        await first.close()
+
+    asyncio.run(scenario())
+
+
+def test_kiosk_path_does_not_wait_for_the_store(tmp_path):
+    async def scenario():
+        inner, repo = _repos(tmp_path)
+        repo.read_timeout = 0.05
+        await repo.ensure_schema()
+
+        async def down(doc):
+            raise ConnectionError("store unavailable")
+
+        async def hanging(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        repo._savers = dict.fromkeys(repo._savers, down)
+        for name in ["get_session", "list_session_photos", "get_photos", "get_order"]:
+            setattr(inner, name, hanging)
+
+        session = {"store_id": "main", "session_id": "s1", "created_at": ts(), "expires_at": ts(120)}
+        await repo.insert_session(session)
+        await repo.insert_photo(make_photo("p1", 1))
+        await repo.bump_rollups("main", "2026-01-01", "2026-01-01T12", {"orders_count": 1})
+
+        assert await repo.get_session("main", "s1") == session
+        assert [p["photo_id"] for p in await repo.list_session_photos("main", "s1")] == ["p1"]
+        try:
+            await repo.get_session("main", "elsewhere")
+        except StoreUnavailable:
+            pass
+        else:
+            raise AssertionError("unknown sessions need the store")
+        assert repo.stats()["timeouts"] == 1
+        assert repo.stats()["pending"] == 3
+
+        repo._savers = {
+            "session": inner.save_session,
+            "photo": inner.save_photo,
+            "order": inner.save_order,
+            "rollup": lambda d: inner.bump_rollups(d["store_id"], d["day"], d["hour"], d["inc"], d.get("maximums")),
+        }
+        assert await repo.flush() == 3
+        (day,) = await inner.get_rollups("main", "day", "2026-01-01", "2026-01-01")
+        assert day["orders_count"] == 1
+        await repo.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_mark_printed_reports_the_first_print_once(tmp_path):
+    async def scenario():
+        _, repo = _repos(tmp_path)
+        await repo.ensure_schema()
+
+        async def down(doc):
+            raise ConnectionError("store unavailable")
+
+        repo._savers = dict.fromkeys(repo._savers, down)
+        await repo.insert_order(make_order("A-1", 0))
+        results = await asyncio.gather(
+            repo.mark_order_printed("main", "A-1", ts(5)), repo.mark_order_printed("main", "A-1", ts(5))
+        )
+        assert sorted(r["status"] for r in results) == ["pending_print", "printed"]
+        await repo.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_transitions_claim_an_order_once(tmp_path):
+    async def scenario():
+        _, repo = _repos(tmp_path)
+        await repo.ensure_schema()
+
+        async def down(doc):
+            raise ConnectionError("store unavailable")
+
+        repo._savers = dict.fromkeys(repo._savers, down)
+        await repo.insert_order(make_order("B", 0))
+        (_, printed), (_, cancelled) = await asyncio.gather(
+            repo.transition_orders("main", ["B"], ["pending_print"], "printed", {"printed_at": ts(5)}),
+            repo.transition_orders("main", ["B"], ["pending_print"], "cancelled", {"cancelled_at": ts(5)}),
+        )
+        assert (printed, cancelled) == ({"B"}, set())
+        assert (await repo.get_order("main", "B"))["status"] == "printed"
+        await repo.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numbering
+from numbering import OrderNumberAllocator
+
+
+def _at(monkeypatch, moment: datetime) -> None:
+    monkeypatch.setattr(numbering, "_now", lambda: moment)
+
+
+def test_numbers_come_from_reserved_blocks(repo, monkeypatch):
+    _at(monkeypatch, datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc))
+    first = OrderNumberAllocator(repo, prefix="APF", block_size=3)
+    second = OrderNumberAllocator(repo, prefix="APF", block_size=3)
+
+    async def scenario():
+        numbers = [await first.next("main", timezone.utc), await second.next("main", timezone.utc)]
+        return numbers + [await first.next("main", timezone.utc) for _ in range(3)]
+
+    numbers = asyncio.run(scenario())
+    # first takes 1-3, second 4-6, first's refill 7-9
+    assert numbers == ["APF-260101-0001", "APF-260101-0004", "APF-260101-0002", "APF-260101-0003", "APF-260101-0007"]
+    assert first.stats()["reservations"] == 2
+    assert first.stats()["remaining_in_block"] == {"main": 2}
+
+
+def test_block_rolls_over_at_the_store_day(repo, monkeypatch):
+    # 23:00 in Sao Paulo is already the next day in UTC
+    sao_paulo = ZoneInfo("America/Sao_Paulo")
+    allocator = OrderNumberAllocator(repo, prefix="APF", block_size=20)
+    _at(monkeypatch, datetime(2026, 1, 2, 2, 0, tzinfo=timezone.utc))
+    assert asyncio.run(allocator.next("main", sao_paulo)) == "APF-260101-0001"
+    assert asyncio.run(allocator.next("main", sao_paulo)) == "APF-260101-0002"
+
+    _at(monkeypatch, datetime(2026, 1, 2, 3, 0, tzinfo=timezone.utc))
+    assert asyncio.run(allocator.next("main", sao_paulo)) == "APF-260102-0001"
+    assert allocator.stats()["reservations"] == 2
+
+
+def test_each_store_has_its_own_sequence(repo, monkeypatch):
+    _at(monkeypatch, datetime(2026, 1, 2, 2, 0, tzinfo=timezone.utc))
+    allocator = OrderNumberAllocator(repo, prefix="APF", block_size=20)
+    zones = {"main": timezone.utc, "centro": ZoneInfo("America/Sao_Paulo")}
+
+    async def scenario():
+        return [await allocator.next(store, zones[store]) for store in ["main", "centro", "main"]]
+
+    # each store counts days in its own timezone
+    assert asyncio.run(scenario()) == ["APF-260102-0001", "APF-260101-0001", "APF-260102-0002"]
+    assert asyncio.run(repo.reserve_sequence("order_number:centro:APF:260101", 1, datetime.now(timezone.utc))) == 21
+
+
+def test_reserving_ahead_survives_a_store_outage(repo, monkeypatch):
+    _at(monkeypatch, datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc))
+    allocator = OrderNumberAllocator(repo, prefix="APF", block_size=2, reserve_ahead=True)
+
+    async def down(*args):
+        raise ConnectionError("store unavailable")
+
+    async def scenario():
+        numbers = [await allocator.next("main", timezone.utc)]
+        while not allocator.stats()["spare_blocks"]:
+            await asyncio.sleep(0.01)
+        repo.reserve_sequence = down
+        numbers += [await allocator.next("main", timezone.utc) for _ in range(3)]
+        return numbers
+
+    assert asyncio.run(scenario()) == ["APF-260101-0001", "APF-260101-0002", "APF-260101-0003", "APF-260101-0004"]
+    assert allocator.stats()["spare_blocks"] == 0
@@ -0,0 +1,42 @@
+import asyncio
+
+from prefetch import PrintPrefetcher
+
+
+def test_job_warms_files_and_caches_payload(tmp_path):
+    photo = tmp_path / "a.jpg"
+    photo.write_bytes(b"x" * 4096)
+
+    async def build():
+        return ["photo"], [photo]
+
+    async def broken():
+        raise FileNotFoundError("b.jpg")
+
+    async def scenario():
+        prefetcher = PrintPrefetcher(workers=1, max_entries=8, ttl=60)
+        prefetcher.start()
+        assert prefetcher.enqueue(("main", "APF-1"), build) == "queued"
+        prefetcher.enqueue(("main", "APF-2"), broken)
+        assert prefetcher.payload(("main", "APF-1")) is None
+        await prefetcher._queue.join()
+        await prefetcher.stop()
+        return prefetcher
+
+    prefetcher = asyncio.run(scenario())
+    assert prefetcher.status(("main", "APF-1")) == "ready"
+    assert prefetcher.payload(("main", "APF-1")) == ["photo"]
+    assert prefetcher.status(("main", "APF-2")) == "failed"
+    assert prefetcher.status(("other", "APF-1")) is None
+    stats = prefetcher.stats()
+    assert stats["bytes_warmed"] == 4096
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+
+def test_nothing_is_queued_before_start():
+    async def build():
+        return [], []
+
+    prefetcher = PrintPrefetcher(workers=2, max_entries=8, ttl=60)
+    assert prefetcher.enqueue(("main", "APF-1"), build) is None
+    assert prefetcher.status(("main", "APF-1")) is None
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from profiling import ProfilingMiddleware, SamplingProfiler, TimedRepository
+from storage import Repository
+
+
+class _Store:
+    name = "fake"
+
+    async def get_order(self, order_number):
+        await asyncio.sleep(0.01)
+        return {"order_number": order_number}
+
+
+def _busy(ms: float) -> None:
+    deadline = time.monotonic() + ms / 1000
+    while time.monotonic() < deadline:
+        pass
+
+
+def _run(profiler: SamplingProfiler, store) -> None:
+    async def endpoint():
+        await store.get_order("A-1")
+        _busy(60)
+
+    async def app(scope, receive, send):
+        scope["endpoint"] = endpoint
+        await endpoint()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def scenario():
+        profiler.enable()
+        try:
+            await ProfilingMiddleware(app, profiler)({"type": "http", "method": "GET", "path": "/x"}, None, send)
+        finally:
+            profiler.disable()
+
+    asyncio.run(scenario())
+
+
+def test_slow_request_is_captured_with_stacks_and_storage_breakdown():
+    profiler = SamplingProfiler(sample_rate=0, slow_ms=50, interval_ms=2)
+    _run(profiler, TimedRepository(_Store()))
+
+    (profile,) = profiler.profiles
+    assert profile["reason"] == "slow"
+    assert profile["route"] == "/x"
+    assert profile["status"] == 200
+    assert profile["samples"] > 0
+    assert all("_busy" in stack or "endpoint" in stack for stack in profile["stacks"])
+    assert profile["storage"]["get_order"]["calls"] == 1
+    assert profile["storage"]["get_order"]["total_ms"] >= 10
+
+
+def test_fast_unsampled_requests_are_dropped_and_disabled_is_passthrough():
+    profiler = SamplingProfiler(sample_rate=0, slow_ms=10_000, interval_ms=2)
+    _run(profiler, TimedRepository(_Store()))
+    assert not profiler.profiles
+
+    store = TimedRepository(_Store())
+    assert isinstance(store, Repository)
+    assert store.name == "fake"
+    assert asyncio.run(store.get_order("A-2")) == {"order_number": "A-2"}
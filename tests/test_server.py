@@ -0,0 +1,177 @@
+import importlib
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from numbering import OrderNumberAllocator
+from prefetch import PrintPrefetcher
+from storage import SQLiteRepository, as_datetime
+from warmup import WarmUp
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 64
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # read once, when the module is first imported
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "import.db"))
+    for name in ["WRITE_JOURNAL_DIR", "STORE_IDS", "STORE_TIMEZONE", "STATS_TIMEZONE", "TRUSTED_PROXY_HOPS"]:
+        monkeypatch.delenv(name, raising=False)
+    server = importlib.import_module("server")
+
+    # fresh store and per-process state for every test
+    store = SQLiteRepository(str(tmp_path / "kiosk.db"), session_ttl_grace=server.SESSION_TTL_GRACE)
+    monkeypatch.setattr(server.repo, "inner", store)
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "_settings_cache", {})
+    monkeypatch.setattr(server, "order_numbers", OrderNumberAllocator(server.repo, prefix="APF", block_size=20))
+    monkeypatch.setattr(server, "warmup", WarmUp(retry_seconds=0.1))
+    monkeypatch.setattr(server, "print_prefetch", PrintPrefetcher(workers=1, max_entries=16, ttl=60))
+    return server
+
+
+@pytest.fixture
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+def _at(server, monkeypatch, moment) -> None:
+    monkeypatch.setattr(server, "_now", lambda: moment)
+
+
+def _order(client, photos: int = 1, server=None, at=None) -> dict:
+    """Order placed now, or created `at` another moment when `server` is given."""
+    session_id = client.post("/api/sessions").json()["session_id"]
+    files = [("files", (f"{i}.png", io.BytesIO(PNG), "image/png")) for i in range(photos)]
+    assert client.post(f"/api/sessions/{session_id}/photos", files=files).status_code == 200
+    with pytest.MonkeyPatch.context() as patch:
+        if server is not None:
+            _at(server, patch, at)
+        response = client.post(f"/api/sessions/{session_id}/orders", json={})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _hours(client, day: str) -> dict:
+    stats = client.get("/api/admin/stats", params={"date_from": day, "date_to": day, "granularity": "hour"}).json()
+    return {b["period"]: b for b in stats["buckets"]}
+
+
+def test_bulk_cancel_reports_changes_and_reverses_the_created_hour(server, client, monkeypatch):
+    order = _order(client, photos=2)
+    printed = _order(client)
+    created = as_datetime(order["created_at"])
+    hour = created.strftime("%Y-%m-%dT%H")
+    assert client.post(f"/api/orders/{printed['order_number']}/mark-printed").status_code == 200
+
+    # cancelled a few hours later, the sale still leaves the hour it was made in
+    _at(server, monkeypatch, created + timedelta(hours=3))
+    numbers = [order["order_number"], printed["order_number"], "APF-000000-9999", order["order_number"]]
+    result = client.post("/api/orders/bulk/cancel", json={"order_numbers": numbers}).json()
+
+    assert result["changed"] == [order["order_number"]]
+    assert result["not_found"] == ["APF-000000-9999"]
+    assert [(o["order_number"], o["status"]) for o in result["orders"]] == [
+        (order["order_number"], "cancelled"),
+        (printed["order_number"], "printed"),
+    ]
+    buckets = _hours(client, created.strftime("%Y-%m-%d"))
+    assert (buckets[hour]["orders_count"], buckets[hour]["photos_count"]) == (1, 1)
+    assert buckets[hour]["revenue"] == printed["total_amount"]
+    assert list(buckets) == [hour]
+
+    # a second cancel changes nothing and reverses nothing
+    again = client.post("/api/orders/bulk/cancel", json={"order_numbers": [order["order_number"]]}).json()
+    assert again["changed"] == []
+    assert _hours(client, created.strftime("%Y-%m-%d"))[hour]["orders_count"] == 1
+
+
+def test_cancelled_order_cannot_be_printed(client):
+    order = _order(client)
+    client.post("/api/orders/bulk/cancel", json={"order_numbers": [order["order_number"]]})
+
+    response = client.post(f"/api/orders/{order['order_number']}/mark-printed")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Pedido cancelado"
+    assert client.get(f"/api/orders/{order['order_number']}").json()["status"] == "cancelled"
+    assert client.post("/api/orders/APF-000000-9999/mark-printed").status_code == 404
+
+
+def test_orders_and_first_prints_feed_the_stats(server, client, monkeypatch):
+    first = _order(client, photos=2)
+    second = _order(client)
+    created = as_datetime(first["created_at"])
+    day = created.strftime("%Y-%m-%d")
+
+    _at(server, monkeypatch, created + timedelta(seconds=30))
+    client.post(f"/api/orders/{first['order_number']}/mark-printed")
+    _at(server, monkeypatch, as_datetime(second["created_at"]) + timedelta(seconds=90))
+    client.post(f"/api/orders/{second['order_number']}/mark-printed")
+    # reprints refresh printed_at but are not counted again
+    _at(server, monkeypatch, created + timedelta(minutes=10))
+    client.post(f"/api/orders/{first['order_number']}/mark-printed")
+
+    next_day = (created + timedelta(days=1)).strftime("%Y-%m-%d")
+    stats = client.get("/api/admin/stats", params={"date_from": day, "date_to": next_day}).json()
+    assert stats["totals"] == {
+        "period": "total",
+        "orders_count": 2,
+        "photos_count": 3,
+        "revenue": round(first["total_amount"] + second["total_amount"], 2),
+        "printed_count": 2,
+        "avg_print_latency_seconds": 60.0,
+        "max_print_latency_seconds": 90.0,
+    }
+    assert sum(b["printed_count"] for b in stats["buckets"]) == 2
+
+
+def test_stats_reject_bad_ranges(client):
+    assert client.get("/api/admin/stats", params={"date_from": "2026-13-01"}).status_code == 400
+    assert client.get("/api/admin/stats", params={"date_from": "2026-02-01", "date_to": "2026-01-01"}).status_code == 400
+    too_long = {"date_from": "2026-01-01", "date_to": "2026-03-01", "granularity": "hour"}
+    assert client.get("/api/admin/stats", params=too_long).status_code == 400
+    empty = client.get("/api/admin/stats", params={"date_from": "2020-01-01", "date_to": "2020-01-01"}).json()
+    assert (empty["buckets"], empty["totals"]["avg_print_latency_seconds"]) == ([], None)
+
+
+def _numbers(client, **params) -> list:
+    return [o["order_number"] for o in client.get("/api/orders", params=params).json()["orders"]]
+
+
+def test_list_orders_pages_and_filters_by_store_day(server, client):
+    client.put("/api/settings", json={"timezone": "America/Sao_Paulo"})
+    moments = [
+        datetime(2026, 1, 1, 2, 30, tzinfo=timezone.utc),  # 2025-12-31 23:30 in Sao Paulo
+        datetime(2026, 1, 1, 3, 30, tzinfo=timezone.utc),  # 2026-01-01 00:30
+        datetime(2026, 1, 1, 15, 0, tzinfo=timezone.utc),  # 2026-01-01 12:00
+        datetime(2026, 1, 2, 3, 0, tzinfo=timezone.utc),  # 2026-01-02 00:00
+    ]
+    numbers = [_order(client, server=server, at=moment)["order_number"] for moment in moments]
+
+    first = client.get("/api/orders", params={"limit": 3}).json()
+    assert [o["order_number"] for o in first["orders"]] == numbers[:0:-1]
+    second = client.get("/api/orders", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    assert ([o["order_number"] for o in second["orders"]], second["next_cursor"]) == ([numbers[0]], None)
+    assert _numbers(client, order="asc", limit=2) == numbers[:2]
+
+    assert _numbers(client, date_from="2026-01-01", date_to="2026-01-01") == [numbers[2], numbers[1]]
+    # datetimes without an offset are store time; end bounds include the given moment
+    assert _numbers(client, date_from="2026-01-01", date_to="2026-01-01T12:00:00") == [numbers[2], numbers[1]]
+    assert _numbers(client, date_from="2026-01-01", date_to="2026-01-01T11:59:59") == [numbers[1]]
+    assert _numbers(client, date_from="2026-01-01T02:30:00+00:00", date_to="2026-01-01T02:30:00Z") == [numbers[0]]
+
+
+def test_list_orders_rejects_bad_cursors_and_dates(client):
+    for params in [
+        {"cursor": "not a cursor"},
+        {"cursor": "bm8tc2VwYXJhdG9y"},  # "no-separator"
+        {"date_from": "2026-02-30"},
+        {"date_to": "yesterday"},
+    ]:
+        response = client.get("/api/orders", params=params)
+        assert response.status_code == 400, params
+    assert client.get("/api/orders", params={"order": "sideways"}).status_code == 422
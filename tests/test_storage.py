@@ -0,0 +1,178 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from storage import SQLiteRepository
+from tests.builders import make_order, ts
+
+
+def test_session_round_trip_keeps_datetimes(repo):
+    doc = {"store_id": "main", "session_id": "s1", "status": "active", "created_at": ts(), "expires_at": ts(120)}
+    asyncio.run(repo.insert_session(doc))
+    assert asyncio.run(repo.get_session("main", "s1")) == doc
+    assert asyncio.run(repo.get_session("main", "missing")) is None
+    assert asyncio.run(repo.get_session("other", "s1")) is None
+
+
+def test_insert_settings_keeps_the_first_doc(repo):
+    asyncio.run(repo.insert_settings({"store_id": "main", "store_name": "Primeira"}))
+    asyncio.run(repo.insert_settings({"store_id": "main", "store_name": "Segunda"}))
+    assert asyncio.run(repo.get_settings("main")) == {"store_id": "main", "store_name": "Primeira"}
+
+
+def test_mark_order_printed_returns_previous_state(repo):
+    asyncio.run(repo.insert_order(make_order("A-1", 0)))
+    before = asyncio.run(repo.mark_order_printed("main", "A-1", ts(5)))
+    assert before["status"] == "pending_print"
+    again = asyncio.run(repo.mark_order_printed("main", "A-1", ts(6)))
+    assert again["status"] == "printed"
+    assert asyncio.run(repo.get_order("main", "A-1"))["printed_at"] == ts(6)
+    assert asyncio.run(repo.mark_order_printed("main", "missing", ts(6))) is None
+
+
+def test_mark_order_printed_leaves_cancelled_orders_alone(repo):
+    asyncio.run(repo.insert_order(make_order("A-1", 0, "cancelled")))
+    before = asyncio.run(repo.mark_order_printed("main", "A-1", ts(5)))
+    assert before["status"] == "cancelled"
+    after = asyncio.run(repo.get_order("main", "A-1"))
+    assert (after["status"], after["printed_at"]) == ("cancelled", None)
+
+
+def test_list_orders_keyset_pagination(repo):
+    for i, minutes in enumerate([0, 0, 1, 2, 3]):
+        asyncio.run(repo.insert_order(make_order(f"A-{i}", minutes, "printed" if i == 4 else "pending_print")))
+
+    seen, after = [], None
+    while True:
+        page = asyncio.run(repo.list_orders("main", status="pending_print", ascending=True, limit=2, after=after))
+        if not page:
+            break
+        seen += [o["order_number"] for o in page]
+        after = (page[-1]["created_at"], page[-1]["order_number"])
+    assert seen == ["A-0", "A-1", "A-2", "A-3"]
+
+    newest = asyncio.run(repo.list_orders("main", limit=1, fields=["order_number"]))
+    assert newest == [{"order_number": "A-4"}]
+    window = asyncio.run(repo.list_orders("main", created_from=ts(1), created_before=ts(3)))
+    assert [o["order_number"] for o in window] == ["A-3", "A-2"]
+
+
+def test_reserve_sequence_hands_out_disjoint_blocks(repo):
+    purge_at = ts(60)
+    assert asyncio.run(repo.reserve_sequence("orders:day", 10, purge_at)) == 10
+    assert asyncio.run(repo.reserve_sequence("orders:day", 10, purge_at)) == 20
+    assert asyncio.run(repo.reserve_sequence("orders:other", 5, purge_at)) == 5
+
+
+def test_rollups_accumulate(repo):
+    asyncio.run(repo.bump_rollups("main", "2026-01-01", "2026-01-01T12", {"orders_count": 1, "revenue_cents": 250}))
+    asyncio.run(repo.bump_rollups("main", "2026-01-01", "2026-01-01T13", {"orders_count": 1, "revenue_cents": 500}))
+    asyncio.run(
+        repo.bump_rollups(
+            "main",
+            "2026-01-01", "2026-01-01T13", {"printed_count": 1, "print_latency_ms_total": 900}, {"print_latency_ms_max": 900}
+        )
+    )
+
+    (day,) = asyncio.run(repo.get_rollups("main", "day", "2026-01-01", "2026-01-01"))
+    assert day["orders_count"] == 2
+    assert day["revenue_cents"] == 750
+    assert day["print_latency_ms_max"] == 900
+    hours = asyncio.run(repo.get_rollups("main", "hour", "2026-01-01", "2026-01-01"))
+    assert [h["hour"] for h in hours] == ["2026-01-01T12", "2026-01-01T13"]
+    assert "print_latency_ms_max" not in hours[0]
+
+    with pytest.raises(ValueError):
+        asyncio.run(repo.bump_rollups("main", "2026-01-01", "2026-01-01T12", {"bogus": 1}))
+
+
+def test_purge_expired(repo):
+    now = datetime.now(timezone.utc)
+    for session_id, expires_at in [("old", now - timedelta(hours=2)), ("new", now + timedelta(hours=2))]:
+        asyncio.run(
+            repo.insert_session({"store_id": "main", "session_id": session_id, "created_at": now, "expires_at": expires_at})
+        )
+    assert asyncio.run(repo.purge_expired()) == 1
+    assert asyncio.run(repo.get_session("main", "old")) is None
+    assert asyncio.run(repo.get_session("main", "new")) is not None
+
+
+def test_transition_orders_only_claims_matching_orders(repo):
+    for i in range(3):
+        asyncio.run(repo.insert_order(make_order(f"A-{i}", i, "printed" if i == 2 else "pending_print")))
+
+    docs, changed = asyncio.run(
+        repo.transition_orders(
+            "main", ["A-0", "A-1", "A-2", "missing"], ["pending_print"], "cancelled", {"cancelled_at": ts(10)}
+        )
+    )
+    assert changed == {"A-0", "A-1"}
+    assert {d["order_number"]: d["status"] for d in docs} == {"A-0": "cancelled", "A-1": "cancelled", "A-2": "printed"}
+    assert asyncio.run(repo.get_order("main", "A-0"))["cancelled_at"] == ts(10)
+
+    _, again = asyncio.run(repo.transition_orders("main", ["A-0"], ["pending_print"], "cancelled", {}))
+    assert again == set()
+    assert len(asyncio.run(repo.get_orders("main", ["A-0", "A-2", "missing"]))) == 2
+
+
+def test_stores_are_isolated(repo):
+    asyncio.run(repo.insert_order(make_order("A-1", 0, store_id="main")))
+    asyncio.run(repo.insert_order(make_order("A-1", 1, store_id="north")))
+    asyncio.run(repo.mark_order_printed("north", "A-1", ts(5)))
+
+    assert asyncio.run(repo.get_order("main", "A-1"))["status"] == "pending_print"
+    assert asyncio.run(repo.get_order("north", "A-1"))["status"] == "printed"
+    assert [o["store_id"] for o in asyncio.run(repo.list_orders("north"))] == ["north"]
+    asyncio.run(repo.bump_rollups("north", "2026-01-01", "2026-01-01T12", {"orders_count": 1}))
+    assert asyncio.run(repo.get_rollups("main", "day", "2026-01-01", "2026-01-01")) == []
+
+
+def test_single_store_file_is_migrated(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE settings (key TEXT PRIMARY KEY, doc TEXT NOT NULL);
+        CREATE TABLE sessions (session_id TEXT PRIMARY KEY, expires_at INTEGER NOT NULL, doc TEXT NOT NULL);
+        CREATE INDEX sessions_expires_at ON sessions (expires_at);
+        CREATE TABLE photos (
+            photo_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, created_at INTEGER NOT NULL,
+            purge_at INTEGER, doc TEXT NOT NULL
+        );
+        CREATE TABLE orders (
+            order_number TEXT PRIMARY KEY, session_id TEXT NOT NULL, status TEXT NOT NULL,
+            created_at INTEGER NOT NULL, doc TEXT NOT NULL
+        );
+        CREATE INDEX orders_created ON orders (created_at, order_number);
+        CREATE TABLE counters (name TEXT PRIMARY KEY, seq INTEGER NOT NULL, purge_at INTEGER);
+        CREATE TABLE stats_daily (day TEXT PRIMARY KEY, orders_count INTEGER NOT NULL DEFAULT 0,
+            photos_count INTEGER NOT NULL DEFAULT 0, revenue_cents INTEGER NOT NULL DEFAULT 0,
+            printed_count INTEGER NOT NULL DEFAULT 0, print_latency_ms_total INTEGER NOT NULL DEFAULT 0,
+            print_latency_ms_max INTEGER);
+        CREATE TABLE stats_hourly (hour TEXT PRIMARY KEY, day TEXT NOT NULL, orders_count INTEGER NOT NULL DEFAULT 0,
+            photos_count INTEGER NOT NULL DEFAULT 0, revenue_cents INTEGER NOT NULL DEFAULT 0,
+            printed_count INTEGER NOT NULL DEFAULT 0, print_latency_ms_total INTEGER NOT NULL DEFAULT 0,
+            print_latency_ms_max INTEGER);
+        INSERT INTO settings VALUES ('global', '{"key": "global", "store_name": "Loja"}');
+        INSERT INTO orders VALUES ('APF-1', 's1', 'pending_print', 1767268800000,
+            '{"order_number": "APF-1", "session_id": "s1", "status": "pending_print",
+              "created_at": "2026-01-01T12:00:00+00:00"}');
+        INSERT INTO counters VALUES ('order_number:APF:260101', 20, NULL);
+        INSERT INTO stats_daily (day, orders_count) VALUES ('2026-01-01', 1);
+        """
+    )
+    conn.close()
+
+    repo = SQLiteRepository(path, session_ttl_grace=timedelta(hours=1), legacy_store_id="main")
+    asyncio.run(repo.ensure_schema())
+    assert asyncio.run(repo.get_settings("main")) == {"store_id": "main", "store_name": "Loja"}
+    assert asyncio.run(repo.get_order("main", "APF-1"))["store_id"] == "main"
+    assert asyncio.run(repo.reserve_sequence("order_number:main:APF:260101", 20, ts())) == 40
+    (day,) = asyncio.run(repo.get_rollups("main", "day", "2026-01-01", "2026-01-01"))
+    assert day["orders_count"] == 1
+    # a second start finds the current schema and leaves the data alone
+    asyncio.run(repo.ensure_schema())
+    assert asyncio.run(repo.get_order("main", "APF-1")) is not None
+    asyncio.run(repo.close())
@@ -0,0 +1,28 @@
+import throttling
+from tests.builders import FakeClock
+from throttling import RatePolicy, TokenBucketLimiter
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttling.time, "monotonic", clock)
+    limiter = TokenBucketLimiter()
+    policy = RatePolicy("pin", per_minute=6, burst=3)
+
+    assert [limiter.acquire(policy, "a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(policy, "a") == 10.0
+    # other clients have their own bucket
+    assert limiter.acquire(policy, "b") == 0
+
+    clock.now += 10
+    assert limiter.acquire(policy, "a") == 0
+    assert limiter.acquire(policy, "a") > 0
+    assert limiter.stats()["limited"] == {"pin": 2}
+
+
+def test_buckets_are_bounded():
+    limiter = TokenBucketLimiter(max_buckets=2)
+    policy = RatePolicy("sessions", per_minute=60, burst=1)
+    for client in ["a", "b", "c"]:
+        limiter.acquire(policy, client)
+    assert limiter.stats()["buckets"] == 2
@@ -0,0 +1,32 @@
+import asyncio
+
+from warmup import WarmUp
+
+
+def test_failed_step_is_retried_without_rerunning_finished_ones():
+    calls = {"schema": 0, "pool": 0}
+
+    async def schema():
+        calls["schema"] += 1
+
+    async def pool():
+        calls["pool"] += 1
+        if calls["pool"] == 1:
+            raise ConnectionError("store unavailable")
+
+    async def scenario():
+        warmup = WarmUp(retry_seconds=0.01)
+        task = asyncio.create_task(warmup.run([("schema", schema), ("pool", pool)]))
+        await asyncio.sleep(0)
+        assert not warmup.ready
+        await task
+        return warmup
+
+    warmup = asyncio.run(scenario())
+    assert warmup.ready
+    assert calls == {"schema": 1, "pool": 2}
+    stats = warmup.stats()
+    assert stats["attempts"] == 2
+    assert set(stats["steps_ms"]) == {"schema", "pool"}
+    assert "store unavailable" in stats["last_error"]
+    assert stats["startup_ms"] > 0